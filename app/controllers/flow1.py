@@ -37,7 +37,7 @@ def flow1_load_df(file_path: str) -> pd.DataFrame:
     try:
         df = RestaurantService.load_df(file_path)
         global restaurant_service
-        restaurant_service.load(file_path)
+        restaurant_service.load(df)
         return df, restaurant_service.restaurants
     except Exception as e:
         logger.error(f"加载餐厅数据时出错: {str(e)}")
@@ -78,7 +78,6 @@ def flow1_generate_restaurant_type(file_path: str) -> pd.DataFrame:
     except Exception as e:
         logger.error(f"生成餐厅类型时出错: {str(e)}")
 
-
 # def flow1_load_from_df(df: pd.DataFrame) -> list[dict]:
 #     """
 #     从 DataFrame 中加载餐厅数据并返回餐厅数据列表
@@ -1,46 +1,86 @@
-from app.services.map_api_service import RestaurantInfo
+from app.services.map_api_service import RestaurantInfo, RESULT_COLUMNS
+from app.services.crawl_service import CrawlJob
+from app.services.tiling_service import TileCrawler
+from app.services.dedup_service import RestaurantDeduplicator
 from app.utils.logger import setup_logger
+from app.config import CONF
+from app.utils.coords import GCJ02, BD09, convert_coordinates, convert_records
 from geopy.geocoders import Nominatim
-import xlwt
+from app.utils.record_writer import open_record_writer
+from app.utils.geocode_cache import geocode_cache, address_key
 
 def flow5_get_restaurantinfo(n: int, token: str, keywords: str, address: str, maptype: int,filename: str):
     c = RestaurantInfo(n, token, keywords, address, maptype,filename)
     restaurantList=c.get_info_write_file()
     return restaurantList
 
+def flow5_crawl_restaurants(n: int, tokens: dict, keywords: list, address: str, address_datum: str = None):
+    """
+    按关键字 × 服务商抓取餐厅，每页完成即落盘；中断后以相同参数再次调用会从断点继续。
+
+    :param n: 每个关键字最多抓取的页数
+    :param tokens: 地图类型（1-高德，2-百度，3-谷歌）-> api key
+    :param keywords: 关键字列表
+    :param address: 城市名或坐标
+    :param address_datum: address 为坐标时其所属坐标系（flow5_location_change 返回 WGS84）
+    :return: (抓取任务, 全部记录)；结果保存后调用 job.discard() 删除断点，
+             记录的坐标统一转换到 SYSTEM.coordinate_datum 坐标系
+
+    抓取过程中每页记录写入任务文件后即释放，内存不随页数增长；抓取完成后一次性读出全部记录，
+    因为 flow5_remove_duplicates 需要在所有关键字、所有服务商的结果之间比较，无法逐页写出。
+    """
+    job = CrawlJob(address, keywords, tokens, n, address_datum=address_datum)
+    restaurantList = convert_records(job.run(), CONF.get("SYSTEM.coordinate_datum", GCJ02))
+    return job, restaurantList
+
+def flow5_crawl_restaurants_tiled(city: str, tokens: dict, keywords: list):
+    """
+    网格模式抓取：按城市边界切分网格逐格检索，触顶的网格递归细分，突破服务商的翻页上限。
+
+    :param city: 城市名
+    :param tokens: 地图类型（1-高德，2-百度）-> api key；城市边界通过高德行政区查询获得
+    :param keywords: 关键字列表
+    :return: 全部记录，坐标统一转换到 SYSTEM.coordinate_datum 坐标系
+    """
+    bbox = TileCrawler.city_bbox(city, tokens.get(1) or CONF.get("SYSTEM.gaode_key", ""))
+    restaurantList = []
+    for maptype, token in tokens.items():
+        provider = RestaurantInfo.PROVIDERS.get(maptype)
+        if provider not in ("gaode", "baidu"):
+            continue
+        # 高德边界为 GCJ-02，转换到百度使用的 BD-09
+        provider_bbox = bbox
+        if provider == "baidu":
+            lons, lats = convert_coordinates([bbox[0], bbox[2]], [bbox[1], bbox[3]], GCJ02, BD09)
+            provider_bbox = (lons[0], lats[0], lons[1], lats[1])
+        for keyword in keywords:
+            crawler = TileCrawler(provider, token, keyword, '餐饮' if maptype == 1 else '美食')
+            restaurantList.extend(crawler.crawl(provider_bbox))
+    return convert_records(restaurantList, CONF.get("SYSTEM.coordinate_datum", GCJ02))
+
+def flow5_remove_duplicates(restaurantList: list) -> list:
+    """合并多个关键字、多个地图服务商抓取到的同一餐厅（坐标需已统一到同一坐标系）"""
+    return RestaurantDeduplicator().deduplicate(restaurantList)
+
 def flow5_write_to_excel(datalist, filename):
-        # 一个Workbook对象，这就相当于创建了一个Excel文件
-        book = xlwt.Workbook( style_compression=0)
-        sheet = book.add_sheet('餐厅', cell_overwrite_ok=True)
-
-        sheet.write(0, 0, '店名')
-        sheet.write(0, 1, '地址')
-        sheet.write(0, 2, '电话')
-        sheet.write(0, 3, '坐标')
-        sheet.write(0, 4, '所属区县')
-        sheet.write(0, 5, '类型')
-        sheet.write(0, 6, '距离')
-        sheet.write(0, 7, '城市')
-
-
-        for i in range(len(datalist)):
-            sheet.write(i + 1, 0, datalist[i]['name'])
-            sheet.write(i + 1, 1, datalist[i]['address'])
-            sheet.write(i + 1, 2, datalist[i]['tel'])
-            sheet.write(i + 1, 3, datalist[i]['location'])
-            sheet.write(i + 1, 4, datalist[i]['adname'])
-            sheet.write(i + 1, 5, datalist[i]['type'])
-            sheet.write(i + 1, 6, datalist[i]['distance'])
-            sheet.write(i + 1, 7, datalist[i]['cityname'])
-
-        book.save(filename)  # r'东莞市.xlsx'
-        print('save success')
-## 根据地区获得经纬度
+    """流式写出抓取结果，按扩展名输出 xlsx（只写模式，无行数上限）/ csv / parquet"""
+    with open_record_writer(filename, RESULT_COLUMNS, sheet_name='餐厅') as writer:
+        writer.write_many(datalist)
+    print('save success')
+_nominatim = None
+
+def _nominatim_geocode(city_name):
+    global _nominatim
+    if _nominatim is None:
+        _nominatim = Nominatim(user_agent='myuseragent')
+    location = _nominatim.geocode(city_name)
+    if location is None:
+        return None
+    return str(location.latitude)+','+str(location.longitude)
+
+## 根据地区获得经纬度（Nominatim，WGS84 坐标系），结果（包括查不到）按地名缓存
 def flow5_location_change(city_name):
-    gps = Nominatim(user_agent='myuseragent')
-    location = gps.geocode(city_name)
-    try:
-        lont_lat=(str(location.latitude)+','+str(location.longitude))
-    except:
-        pass
+    lont_lat = geocode_cache.get_or_compute(address_key("nominatim", city_name), lambda: _nominatim_geocode(city_name))
+    if lont_lat is None:
+        raise ValueError(f"无法获取 {city_name} 的经纬度")
     return lont_lat
\ No newline at end of file
@@ -1,3 +1,4 @@
 from .restaurant_model import Restaurant
+from .restaurant_table import RestaurantListView, compact_restaurant_frame
 from .vehicle_model import Vehicle
 from .oil_model import OilEntry, CollectionRecord, OilCollectionSheet
\ No newline at end of file
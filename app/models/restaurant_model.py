@@ -1,7 +1,7 @@
 from typing import Optional, List, Union, Any
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, ValidationInfo
 # from app.services.address_service import AddressService
-from app.utils.conversion import convert_to_pinyin, convert_miles_to_km
+from app.utils.conversion import convert_to_pinyin, convert_to_pinyin_batch, convert_miles_to_km
 from app.config import get_config
 import re
 
@@ -31,10 +31,13 @@ class Restaurant(BaseModel):
 
 
     @field_validator("location")
-    def validate_location(cls, value):
+    def validate_location(cls, value, info: ValidationInfo):
         """
         验证 location 字段的格式是否正确
+        （批量加载时整列已由 app.utils.coords 校验过，通过校验上下文 locations_checked 跳过逐行校验）
         """
+        if info.context and info.context.get("locations_checked"):
+            return value
         pattern = re.compile(r'^-?\d+(\.\d+)?,-?\d+(\.\d+)?$')
         if not pattern.match(value):
             raise ValueError(f"location 必须是 '纬度,经度' 格式（例如 '39.9042,116.4074'）, 现在为{value}")
@@ -57,8 +60,29 @@ class Restaurant(BaseModel):
             self.distance_mile = convert_miles_to_km(self.distance_km)
         if not self.contact_person_en and self.contact_person_zh:
             self.contact_person_en = convert_to_pinyin(self.contact_person_zh)
-        
-    
+
+    @staticmethod
+    def fill_defaults_batch(restaurants: List["Restaurant"], pinyin: bool = True):
+        """
+        批量填充默认值，规则与 fill_defaults 相同，但整列只转换一次拼音
+
+        :param pinyin: 为 False 时只填充英里距离，拼音由调用方另行填充（见 EnrichmentPipeline 的 defaults 步骤）
+        """
+        need_name = [r for r in restaurants if not r.english_name and r.chinese_name] if pinyin else []
+        need_contact = [r for r in restaurants if not r.contact_person_en and r.contact_person_zh] if pinyin else []
+        pinyins = convert_to_pinyin_batch(
+            [r.chinese_name for r in need_name] + [r.contact_person_zh for r in need_contact]
+        )
+
+        for restaurant, pinyin in zip(need_name, pinyins[:len(need_name)]):
+            restaurant.english_name = pinyin
+        for restaurant, pinyin in zip(need_contact, pinyins[len(need_name):]):
+            restaurant.contact_person_en = pinyin
+        for restaurant in restaurants:
+            if not restaurant.distance_mile and restaurant.distance_km:
+                restaurant.distance_mile = convert_miles_to_km(restaurant.distance_km)
+
+
     def model_dump_with_mapping(self) -> dict:
         """将模型字段映射到 Excel 中的列名"""
         name_mapping = get_config().BUSINESS.RESTAURANT.餐厅对应关系
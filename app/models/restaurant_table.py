@@ -0,0 +1,87 @@
+from collections.abc import Sequence
+from typing import Iterable, Iterator, List
+import pandas as pd
+from app.models.restaurant_model import Restaurant
+
+
+def compact_restaurant_frame(df: pd.DataFrame, columns: Iterable[str]) -> pd.DataFrame:
+    """
+    将取值重复度高的文本列（城市、区域、街道、类型等）转换为 category 类型，
+    每个不同的字符串只保存一份，原地修改并返回 df。
+
+    :param df: 餐厅数据
+    :param columns: 需要压缩的列名，不存在的列会被忽略
+    """
+    for col in columns:
+        if col in df.columns and (pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col])):
+            try:
+                df[col] = df[col].astype("category")
+            except TypeError:
+                # 混合了无法比较的类型时保持原样
+                pass
+    return df
+
+
+def column_values(series: pd.Series) -> list:
+    """取出整列的值；category 列中的缺失值统一还原为 None"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.astype(object).where(series.notna(), None).tolist()
+    return series.tolist()
+
+
+class RestaurantListView(Sequence):
+    """
+    以 DataFrame 为唯一存储的只读餐厅列表视图。
+    只在访问时按行构建 Restaurant 对象（数据已校验过，使用 model_construct 不再重复校验），不常驻内存。
+    每次访问得到的都是新构建的副本，对它们的修改不会写回表中，也不会在下次访问时保留；
+    需要修改餐厅数据时请修改 DataFrame（RestaurantService.restaurants_df）后重新生成视图。
+    """
+
+    __slots__ = ("_df", "_field_columns", "_other_columns")
+
+    # 迭代时每次批量构建的行数
+    BATCH_SIZE = 1000
+
+    def __init__(self, df: pd.DataFrame, name_mapping: dict):
+        """
+        :param df: 列名为 Excel 列名的餐厅数据（即 RestaurantService.to_df 的结果）
+        :param name_mapping: 餐厅对应关系，字段名 -> Excel 列名
+        """
+        self._df = df
+        self._field_columns = {}
+        for field_name in Restaurant.model_fields:
+            if field_name == "other_info":
+                continue
+            col = name_mapping.get(field_name) if field_name in name_mapping else field_name
+            if col in df.columns:
+                self._field_columns[field_name] = col
+        mapped = set(self._field_columns.values())
+        self._other_columns = [col for col in df.columns if col not in mapped]
+
+    def __len__(self) -> int:
+        return len(self._df)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._build(i, i + 1)[0] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("餐厅索引超出范围")
+        return self._build(index, index + 1)[0]
+
+    def __iter__(self) -> Iterator[Restaurant]:
+        for start in range(0, len(self), self.BATCH_SIZE):
+            yield from self._build(start, min(start + self.BATCH_SIZE, len(self)))
+
+    def _build(self, start: int, stop: int) -> List[Restaurant]:
+        part = self._df.iloc[start:stop]
+        fields = {name: column_values(part[col]) for name, col in self._field_columns.items()}
+        if self._other_columns:
+            other_infos = part[self._other_columns].to_dict("records")
+        else:
+            other_infos = [{} for _ in range(len(part))]
+        return [
+            Restaurant.model_construct(**{name: values[i] for name, values in fields.items()}, other_info=other_info)
+            for i, other_info in enumerate(other_infos)
+        ]
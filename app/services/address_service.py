@@ -1,47 +1,166 @@
 import re
-import requests
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
 from app.config import CONF
+from app.services.fetch_service import get_rate_limiter
+from app.services.http_service import http_transport, TransportError
+from app.utils.coords import Coordinates, parse_locations
+from app.utils.geocode_cache import geocode_cache, location_key
+from app.utils.logger import setup_logger
+
+REGEO_URL = "https://restapi.amap.com/v3/geocode/regeo"
+# 高德逆地理编码批量模式每次最多 20 个坐标
+REGEO_BATCH_SIZE = 20
+# 地址中的镇/街道名：先依次跳过完整的省、市、区/县前缀，再取到 “镇” 或 “街道” 为止。
+# 前缀各级不跨越 “镇”/“街”，市一级不包含区/县，因此 “番禺区市桥街道” 不会把 “番禺区市” 当成市，
+# 名称中带有省/市/区/县字样的镇街（市桥街道、新市镇、县前街道、区庄街道）保持完整
+TOWN_PATTERN = (r"(?:[^镇街市区县\s,，]+?(?:省|自治区))?"
+                r"(?:[^镇街区县\s,，]+?(?:市|自治州))?"
+                r"(?:[^镇街\s,，]+?(?:区|县))?"
+                r"([^\s,，]+?(?:镇|街道))")
+_TOWN_REGEX = re.compile(TOWN_PATTERN)
+
+
+def extract_town(address) -> Optional[str]:
+    """
+    用正则从地址中提取镇/街道（不查询坐标），规则与 AddressService.extract_towns_batch 相同
+
+    >>> extract_town("广东省广州市番禺区市桥街道西丽路1号")
+    '市桥街道'
+    >>> extract_town("浙江省湖州市德清县新市镇环城北路2号")
+    '新市镇'
+    >>> extract_town("广东省惠州市惠城区县前街道下角路3号")
+    '县前街道'
+    >>> extract_town("广东省广州市越秀区区庄街道农林下路4号")
+    '区庄街道'
+    >>> extract_town("惠州市博罗县石湾镇兴业大道东侧壹嘉广场1楼")
+    '石湾镇'
+    >>> extract_town("广州市天河区体育西路5号") is None
+    True
+    """
+    if not isinstance(address, str):
+        return None
+    match = _TOWN_REGEX.search(address)
+    return match.group(1) if match else None
+
 
 class AddressService:
     def __init__(self, config=CONF):
         self.config = config
         self.apikeys = self.config.SYSTEM.apikeys
 
-    def extract_town_from_address(self, address: str, city: str, district: str) -> Optional[str]:
+    def extract_town_from_address(self, address: str, city: str, district: str,
+                                  location: Optional[str] = None) -> Optional[str]:
         """
-        从地址中提取镇级地址，如果找不到，则使用高德地图 API 进行查询
+        从地址中提取镇级地址，如果找不到，则按坐标使用高德地图 API 进行查询（与 extract_towns_batch 规则相同）
+
+        :param location: 餐厅坐标（'纬度,经度'），为空时只做地址匹配
         """
-        # 获取当前城市和区县的配置镇信息
-        configured_towns = self.config.get(f"BUSINESS.RESTAURANT.districts.{city}.{district}", [])
+        return self.extract_towns_batch([address], [location])[0]
 
-        # 正则模式匹配 “镇” 或 “街道”
-        town_pattern = re.compile(r"(.*?(镇|街道))")
+    def _query_town_from_location(self, location: str) -> Optional[str]:
+        """
+        使用高德地图 API 根据经纬度查询镇/街道信息（结果按坐标缓存，查不到镇/街道也会缓存）
+        """
+        amap_api_key = self._amap_key()
+        api_url = REGEO_URL
 
-        match = town_pattern.search(address)
-        if match:
-            potential_town = match.group(1)
-            # 检查匹配到的镇名是否在配置文件中
-            if any(potential_town in town for town in configured_towns):
-                return potential_town
-            else:
-                # 如果镇名未在配置中直接匹配上，也允许返回找到的值
-                return potential_town
+        found, town_name = geocode_cache.get(location_key("gaode_regeo", location))
+        if found:
+            return town_name
+        try:
+            data = http_transport.check_status(
+                "gaode", api_url, http_transport.get_json("gaode", api_url, params={"location": location, "key": amap_api_key}))
+        except TransportError:
+            # 请求失败或返回错误状态（key 无效、配额用尽等）时不缓存，下次重新查询
+            return None
+        # 提取返回地址中的 “乡镇” 字段（没有时高德返回空列表）
+        town_name = data.get("regeocode", {}).get("addressComponent", {}).get("township") or None
+        geocode_cache.put(location_key("gaode_regeo", location), town_name)
+        return town_name
 
-        # 如果没有匹配到 “镇” 或 “街道”，使用高德地图 API 进行查询
-        return self._query_town_from_location(address)
+    def _amap_key(self) -> str:
+        """高德 key：优先使用 SYSTEM.amap_api_key，否则使用抓取页面保存的 SYSTEM.gaode_key"""
+        return self.config.get("SYSTEM.amap_api_key", "") or self.config.get("SYSTEM.gaode_key", "") or ""
 
-    def _query_town_from_location(self, location: str) -> Optional[str]:
+    def extract_towns_batch(self, addresses: Iterable, locations: Union[Iterable, Coordinates]) -> List[Optional[str]]:
         """
-        使用高德地图 API 根据经纬度查询镇/街道信息
+        批量提取镇/街道：先对整列地址做正则匹配，
+        匹配不到的行再按坐标批量逆地理编码（见 query_towns_batch）；没有配置高德 key 时只做地址匹配。
+
+        :param addresses: 地址列
+        :param locations: 坐标列，格式同 Restaurant.location（'纬度,经度'，GCJ-02），
+                          也可以是已解析好的 Coordinates（如 RestaurantService.coordinates），避免重复解析
+        :return: 与输入逐行对应的镇/街道名称，查不到为 None
         """
-        amap_api_key = self.config.get("SYSTEM.amap_api_key", "")
-        api_url = f"https://restapi.amap.com/v3/geocode/regeo?location={location}&key={amap_api_key}"
+        series = pd.Series(list(addresses), dtype=object)
+        is_str = series.map(lambda value: isinstance(value, str))
+        matched = series.where(is_str).str.extract(TOWN_PATTERN, expand=True)[0]
+        towns = [town if isinstance(town, str) else None for town in matched]
 
-        response = requests.get(api_url)
-        if response.status_code == 200:
-            data = response.json()
-            # 提取返回地址中的 “乡镇” 字段
-            town_name = data.get("regeocode", {}).get("addressComponent", {}).get("township")
-            return town_name
-        return None
+        misses = [row for row, town in enumerate(towns) if town is None]
+        if not misses or not self._amap_key():
+            return towns
+        if isinstance(locations, Coordinates):
+            lat, lon = locations.lat[misses], locations.lon[misses]
+        else:
+            location_list = list(locations)
+            (lat, lon), _ = parse_locations([location_list[row] for row in misses])
+        # 高德接口的坐标顺序为 '经度,纬度'；保留 6 位小数，相同坐标只查询一次
+        gaode_locations = {
+            row: f"{lon[k]:.6f},{lat[k]:.6f}"
+            for k, row in enumerate(misses) if not (np.isnan(lat[k]) or np.isnan(lon[k]))
+        }
+        resolved = self.query_towns_batch(gaode_locations.values())
+        for row, location in gaode_locations.items():
+            towns[row] = resolved.get(location)
+        return towns
+
+    def query_towns_batch(self, locations: Iterable[str], concurrency: Optional[int] = None) -> Dict[str, Optional[str]]:
+        """
+        批量逆地理编码查询镇/街道：坐标去重、先查缓存，未命中的每 20 个合成一次 batch 请求，
+        多个请求并发发送（受高德限流器约束）。
+
+        :param locations: 高德坐标 '经度,纬度'
+        :param concurrency: 并发请求数，默认读取 SYSTEM.map_fetch_concurrency
+        :return: 坐标 -> 镇/街道名称（查不到或请求失败为 None）
+        """
+        result: Dict[str, Optional[str]] = {}
+        pending = []
+        for location in dict.fromkeys(locations):
+            found, town_name = geocode_cache.get(location_key("gaode_regeo", location))
+            if found:
+                result[location] = town_name
+            else:
+                pending.append(location)
+        if not pending:
+            return result
+
+        batches = [pending[i:i + REGEO_BATCH_SIZE] for i in range(0, len(pending), REGEO_BATCH_SIZE)]
+        concurrency = concurrency or self.config.get("SYSTEM.map_fetch_concurrency", 4)
+        with ThreadPoolExecutor(max_workers=max(1, min(int(concurrency), len(batches)))) as executor:
+            for batch, towns in executor.map(self._query_towns, batches):
+                for location, town_name in zip(batch, towns or [None] * len(batch)):
+                    result[location] = town_name
+                    if towns is not None:
+                        # 请求失败不缓存，下次重新查询
+                        geocode_cache.put(location_key("gaode_regeo", location), town_name)
+        return result
+
+    def _query_towns(self, batch: List[str]) -> Tuple[List[str], Optional[List[Optional[str]]]]:
+        """发送一次 batch 请求，返回 (坐标, 逐个对应的镇/街道)；请求失败时后者为 None"""
+        get_rate_limiter("gaode").acquire_sync()
+        try:
+            data = http_transport.check_status("gaode", REGEO_URL, http_transport.get_json("gaode", REGEO_URL, params={
+                "location": "|".join(batch), "batch": "true", "key": self._amap_key()}))
+        except TransportError as e:
+            setup_logger("moco.log").warning(f"批量逆地理编码失败（{len(batch)} 个坐标）：{e}")
+            return batch, None
+        regeocodes = data.get("regeocodes") or []
+        if len(regeocodes) != len(batch):
+            setup_logger("moco.log").warning(f"批量逆地理编码返回 {len(regeocodes)} 条结果，请求了 {len(batch)} 个坐标")
+            return batch, None
+        # 没有乡镇时高德返回空列表
+        return batch, [(item.get("addressComponent") or {}).get("township") or None for item in regeocodes]
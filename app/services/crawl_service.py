@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+from app.utils.file_io import rp
+from app.utils.logger import setup_logger
+from app.services.map_api_service import RestaurantInfo
+
+
+class CrawlJob:
+    """
+    可断点续跑的餐厅抓取任务：关键字 × 服务商 × 页码。
+    任务计划（每个 (服务商, 关键字, 页码) 单元）和已完成单元的结果保存在 SQLite 中，
+    每页完成时立即落盘；中断（异常、配额耗尽、关闭窗口）后以相同参数重新运行，
+    只请求尚未完成的页。
+    """
+
+    def __init__(self, address: str, keywords: List[str], tokens: Dict[int, str], n: int,
+                 job_dir: Optional[str] = None, address_datum: Optional[str] = None):
+        """
+        :param address: 城市名或坐标
+        :param keywords: 关键字列表，结果按此顺序拼接
+        :param tokens: 地图类型（1-高德，2-百度，3-谷歌）-> api key，按此顺序抓取
+        :param n: 每个关键字最多抓取的页数
+        :param job_dir: 任务文件目录，默认 app/var/crawl
+        :param address_datum: address 为坐标时其所属坐标系，见 RestaurantInfo
+        """
+        self.address = address
+        self.keywords = list(dict.fromkeys(keywords))
+        self.tokens = dict(tokens)
+        self.n = n
+        self.address_datum = address_datum
+        self.logger = setup_logger("moco.log")
+        # 任务标识只取决于抓取范围，不含 api key，换 key 后仍能续跑
+        spec = json.dumps({"address": address, "keywords": sorted(self.keywords),
+                           "maptypes": sorted(self.tokens), "n": n}, ensure_ascii=False, sort_keys=True)
+        self.job_id = hashlib.sha1(spec.encode("utf-8")).hexdigest()[:16]
+        self.path = os.path.join(job_dir or rp("", folder=["var", "crawl"]), f"{self.job_id}.sqlite")
+        self._spec = spec
+        self._conn = None
+        self._lock = threading.Lock()
+        self.status_errors = []  # 本次运行中服务商返回错误 status 而提前停止的 (服务商, 关键字, 错误)
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS units (provider TEXT NOT NULL, keyword TEXT NOT NULL, "
+                "page INTEGER NOT NULL, done INTEGER NOT NULL DEFAULT 0, is_last INTEGER NOT NULL DEFAULT 0, "
+                "records TEXT, finished REAL, PRIMARY KEY (provider, keyword, page))")
+            self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('spec', ?)", (self._spec,))
+            self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('created', ?)", (str(time.time()),))
+            self._conn.commit()
+        return self._conn
+
+    def _plan(self) -> List[Tuple[RestaurantInfo, str, str]]:
+        """为每个 (服务商, 关键字) 建立查询对象，并把其全部页写入计划"""
+        plan = []
+        with self._lock:
+            conn = self._connection()
+            for maptype, token in self.tokens.items():
+                for keyword in self.keywords:
+                    info = RestaurantInfo(self.n, token, keyword, self.address, maptype, "", self.address_datum)
+                    provider = RestaurantInfo.PROVIDERS[maptype]
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO units (provider, keyword, page) VALUES (?, ?, ?)",
+                        [(provider, keyword, page) for page in range(self.n)])
+                    plan.append((info, provider, keyword))
+            conn.commit()
+        return plan
+
+    def _done_pages(self, provider: str, keyword: str) -> Dict[int, bool]:
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT page, is_last FROM units WHERE provider = ? AND keyword = ? AND done = 1",
+                (provider, keyword)).fetchall()
+        return {page: bool(is_last) for page, is_last in rows}
+
+    def _checkpoint(self, provider: str, keyword: str, page: int, records: List[dict], is_last: bool):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "UPDATE units SET done = 1, is_last = ?, records = ?, finished = ? "
+                "WHERE provider = ? AND keyword = ? AND page = ?",
+                (int(is_last), json.dumps(records, ensure_ascii=False), time.time(), provider, keyword, page))
+            conn.commit()
+
+    @staticmethod
+    def _pending_pages(done: Dict[int, bool], n: int) -> List[int]:
+        """尚需抓取的页：已知最后一页之前、且未完成的页"""
+        last = min((page for page, is_last in done.items() if is_last), default=n - 1)
+        return [page for page in range(last + 1) if page not in done]
+
+    def progress(self) -> Tuple[int, int]:
+        """返回 (已完成的单元数, 计划中的单元总数)"""
+        with self._lock:
+            row = self._connection().execute("SELECT COALESCE(SUM(done), 0), COUNT(*) FROM units").fetchone()
+        return int(row[0]), int(row[1])
+
+    def run(self) -> List[dict]:
+        """
+        执行（或继续执行）任务，返回全部记录。
+        某页重试后仍失败时抛出异常，已完成的页保留在任务文件中，下次运行从断点继续。
+        服务商返回错误 status（key 无效、配额用尽等）时只停止该关键字的翻页，记入 status_errors，
+        出错的页不标记为完成，修正后再次运行会补抓。
+        """
+        plan = self._plan()
+        done, total = self.progress()
+        if done:
+            self.logger.info(f"抓取任务 {self.job_id} 从断点继续：已完成 {done}/{total} 页")
+
+        for info, provider, keyword in plan:
+            pending = self._pending_pages(self._done_pages(provider, keyword), self.n)
+            if not pending:
+                continue
+            _, page_requests, fetch_page = info.page_plan()
+
+            def on_page(index: int, result, provider=provider, keyword=keyword, pending=pending):
+                self._checkpoint(provider, keyword, pending[index], result.records, result.is_last)
+
+            # 每页的记录已写入任务文件，抓取过程中不在内存中保留
+            fetcher = info.page_fetcher(provider)
+            fetcher.fetch([page_requests[page] for page in pending], fetch_page, on_page, collect=False)
+            if fetcher.status_errors:
+                self.status_errors.extend((provider, keyword, error) for error in fetcher.status_errors)
+                self.logger.warning(f"抓取任务 {self.job_id}：{provider} {keyword} 因服务商返回错误提前停止")
+            else:
+                self.logger.info(f"抓取任务 {self.job_id}：{provider} {keyword} 完成")
+
+        return self.results()
+
+    def iter_results(self) -> Iterator[dict]:
+        """按服务商、关键字、页码顺序逐条产出已完成的记录，每组截止到最后一页；一次只读取一组"""
+        for maptype in self.tokens:
+            provider = RestaurantInfo.PROVIDERS[maptype]
+            for keyword in self.keywords:
+                with self._lock:
+                    rows = self._connection().execute(
+                        "SELECT is_last, records FROM units WHERE provider = ? AND keyword = ? AND done = 1 "
+                        "ORDER BY page", (provider, keyword)).fetchall()
+                for is_last, data in rows:
+                    yield from json.loads(data)
+                    if is_last:
+                        break
+
+    def results(self) -> List[dict]:
+        """全部已完成的记录，顺序同 iter_results"""
+        return list(self.iter_results())
+
+    def discard(self):
+        """删除任务文件（任务完成且结果已保存后调用）"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
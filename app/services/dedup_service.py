@@ -0,0 +1,207 @@
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+import pandas as pd
+from app.config import CONF
+
+# 名称/地址归一化时去掉的字符：空白和标点（保留中英文和数字）
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+_PHONE_SPLIT = re.compile(r"[;,，；/、|\s]+")
+
+# 纬度 1 度约 111 公里
+_METERS_PER_DEGREE = 111_320.0
+
+
+def normalize_text(text) -> str:
+    """全角转半角、转小写，并去掉空白和标点"""
+    if not isinstance(text, str):
+        return ""
+    return _NON_WORD.sub("", unicodedata.normalize("NFKC", text).lower())
+
+
+def normalize_phones(tel) -> Set[str]:
+    """把一个电话字段拆成号码集合，每个号码只保留数字，去掉国家码和区号前缀（取后 8 位比较）"""
+    if not isinstance(tel, str):
+        return set()
+    phones = set()
+    for part in _PHONE_SPLIT.split(tel):
+        digits = re.sub(r"\D", "", part)
+        if len(digits) >= 7:
+            phones.add(digits[-8:])
+    return phones
+
+
+def bigrams(text: str) -> Set[str]:
+    """字符二元组集合，单字符文本取其本身"""
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def dice(a: Set[str], b: Set[str]) -> float:
+    """Dice 相似度，两个空集合相似度为 0"""
+    if not a or not b:
+        return 0.0
+    return 2.0 * len(a & b) / (len(a) + len(b))
+
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i: int, j: int):
+        i, j = self.find(i), self.find(j)
+        if i != j:
+            # 以较早出现的记录为根，合并结果按首次出现的顺序输出
+            self.parent[max(i, j)] = min(i, j)
+
+
+class RestaurantDeduplicator:
+    """
+    抓取结果的去重引擎：
+    1. 按坐标所在网格分块（网格边长等于判重半径），每条记录只与本格及相邻 8 格、且距离在半径内的记录比较；
+       没有坐标的记录按归一化名称分块；
+    2. 在块内比较归一化后的名称、电话和地址（字符二元组 Dice 相似度），满足规则即判为同一餐厅；
+    3. 同一餐厅的多条记录合并为一条：以信息最全的记录为准，补齐空字段、合并电话，并记录来源。
+    """
+
+    def __init__(self, radius_m: Optional[float] = None, name_threshold: Optional[float] = None,
+                 address_threshold: Optional[float] = None):
+        """
+        :param radius_m: 判重半径（米），默认读取 SYSTEM.dedup.radius_m
+        :param name_threshold: 名称相似度阈值，默认读取 SYSTEM.dedup.name_threshold
+        :param address_threshold: 地址相似度阈值，默认读取 SYSTEM.dedup.address_threshold
+        """
+        self.radius_m = radius_m or CONF.get("SYSTEM.dedup.radius_m", 200)
+        self.name_threshold = name_threshold or CONF.get("SYSTEM.dedup.name_threshold", 0.75)
+        self.address_threshold = address_threshold or CONF.get("SYSTEM.dedup.address_threshold", 0.8)
+
+    def deduplicate(self, records: Iterable[dict]) -> List[dict]:
+        """
+        :param records: 抓取记录（location 为同一坐标系下的 '经度,纬度'）
+        :return: 去重后的记录，按首次出现的顺序排列；每条记录带有 merged_count（合并的条数）和 sources（来源）字段
+        """
+        records = list(records)
+        if not records:
+            return []
+        names = [normalize_text(record.get("name")) for record in records]
+        addresses = [normalize_text(record.get("address")) for record in records]
+        name_grams = [bigrams(name) for name in names]
+        address_grams = [bigrams(address) for address in addresses]
+        phones = [normalize_phones(record.get("tel")) for record in records]
+        lon, lat = self._coordinates(records)
+
+        union_find = _UnionFind(len(records))
+
+        located = ~(np.isnan(lon) | np.isnan(lat))
+
+        def same(i: int, j: int) -> bool:
+            if not (located[i] and located[j]):
+                # 缺少坐标时同名之外还要求电话相同或地址相近
+                return bool(phones[i] & phones[j]) or \
+                    dice(address_grams[i], address_grams[j]) >= self.address_threshold
+            if names[i] and names[i] == names[j]:
+                return True
+            if phones[i] & phones[j]:
+                return True
+            name_sim = dice(name_grams[i], name_grams[j])
+            if name_sim >= self.name_threshold:
+                return True
+            return name_sim >= 0.5 and dice(address_grams[i], address_grams[j]) >= self.address_threshold
+
+        for i, j in self._candidate_pairs(lon, lat, names):
+            if union_find.find(i) != union_find.find(j) and same(i, j):
+                union_find.union(i, j)
+
+        clusters: Dict[int, List[int]] = {}
+        for i in range(len(records)):
+            clusters.setdefault(union_find.find(i), []).append(i)
+        return [self._merge([records[i] for i in rows]) for rows in clusters.values()]
+
+    @staticmethod
+    def _coordinates(records: List[dict]) -> Tuple[np.ndarray, np.ndarray]:
+        locations = pd.Series([record.get("location") for record in records], dtype=object)
+        parts = locations.where(locations.map(lambda value: isinstance(value, str))).str.split(",", n=1, expand=True)
+        if parts.shape[1] < 2:
+            nan = np.full(len(records), np.nan)
+            return nan, nan.copy()
+        return (pd.to_numeric(parts[0], errors="coerce").to_numpy(dtype=float),
+                pd.to_numeric(parts[1], errors="coerce").to_numpy(dtype=float))
+
+    def _candidate_pairs(self, lon: np.ndarray, lat: np.ndarray, names: List[str]) -> Iterable[Tuple[int, int]]:
+        """生成需要比较的记录对 (i, j)，i < j"""
+        has_location = ~(np.isnan(lon) | np.isnan(lat))
+
+        # 有坐标：按网格分块，只比较相邻网格中距离在半径内的记录
+        rows = np.flatnonzero(has_location)
+        if len(rows):
+            lat_step = self.radius_m / _METERS_PER_DEGREE
+            cos_lat = np.cos(np.radians(np.nanmean(lat[rows])))
+            lon_step = lat_step / max(cos_lat, 0.01)
+            cell_x = np.floor(lon[rows] / lon_step).astype(np.int64)
+            cell_y = np.floor(lat[rows] / lat_step).astype(np.int64)
+            cells: Dict[Tuple[int, int], List[int]] = {}
+            for row, x, y in zip(rows.tolist(), cell_x.tolist(), cell_y.tolist()):
+                cells.setdefault((x, y), []).append(row)
+
+            radius_sq = self.radius_m ** 2
+            for (x, y), members in cells.items():
+                # 只向“右上”方向的相邻网格比较，每对网格只比较一次
+                neighbours = [members]
+                for dx, dy in ((1, -1), (1, 0), (1, 1), (0, 1)):
+                    other = cells.get((x + dx, y + dy))
+                    if other:
+                        neighbours.append(other)
+                block = np.array([row for group in neighbours for row in group])
+                block_lon, block_lat = lon[block], lat[block]
+                for k, i in enumerate(members):
+                    start = k + 1  # 本格内只与后面的记录比较，相邻格全部比较
+                    dx_m = (block_lon[start:] - lon[i]) * _METERS_PER_DEGREE * cos_lat
+                    dy_m = (block_lat[start:] - lat[i]) * _METERS_PER_DEGREE
+                    for j in block[start:][dx_m * dx_m + dy_m * dy_m <= radius_sq].tolist():
+                        yield (i, j) if i < j else (j, i)
+
+        # 没有坐标：与同名记录（不论是否有坐标）比较
+        by_name: Dict[str, List[int]] = {}
+        for i, name in enumerate(names):
+            if name:
+                by_name.setdefault(name, []).append(i)
+        for i in np.flatnonzero(~has_location).tolist():
+            for j in by_name.get(names[i], []):
+                if j != i:
+                    yield (i, j) if i < j else (j, i)
+
+    @staticmethod
+    def _merge(group: List[dict]) -> dict:
+        """合并同一餐厅的多条记录"""
+        if len(group) == 1:
+            return {**group[0], "merged_count": 1, "sources": group[0].get("source") or ""}
+        # 以非空字段最多的记录为准，相同时取最早出现的
+        base = max(group, key=lambda record: sum(1 for value in record.values() if value not in (None, "", [])))
+        merged = dict(base)
+        for record in group:
+            for key, value in record.items():
+                if merged.get(key) in (None, "", []) and value not in (None, "", []):
+                    merged[key] = value
+
+        # 电话取所有记录中不重复的号码
+        tels, seen = [], set()
+        for record in group:
+            for tel in _PHONE_SPLIT.split(record.get("tel") or ""):
+                key = re.sub(r"\D", "", tel)[-8:]
+                if tel and key not in seen:
+                    seen.add(key)
+                    tels.append(tel)
+        if tels:
+            merged["tel"] = ";".join(tels)
+
+        merged["merged_count"] = len(group)
+        merged["sources"] = ",".join(sorted({str(record.get("source") or "") for record in group} - {""}))
+        return merged
@@ -0,0 +1,254 @@
+import hashlib
+import json
+import os
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from app.services.matcher_service import StreetMatcher, RestaurantTypeClassifier
+from app.utils.conversion import convert_to_pinyin_batch, pinyin_cache
+
+
+class ChunkError(NamedTuple):
+    """单个数据块的处理错误"""
+    index: int
+    start: int
+    stop: int
+    message: str
+
+
+# 各步骤依赖的输入列和产出的列（均为 Restaurant 字段名）
+STEP_INPUTS = {
+    "street": ("city", "district", "chinese_address"),
+    "type": ("chinese_name", "chinese_address"),
+    "defaults": ("chinese_name", "english_name", "contact_person_zh", "contact_person_en"),
+}
+STEP_OUTPUTS = {
+    "street": ("street",),
+    "type": ("restaurant_type",),
+    "defaults": ("english_name", "contact_person_en"),
+}
+
+
+def config_fingerprint(config: dict) -> str:
+    """配置内容的指纹，配置修改后随之改变"""
+    text = json.dumps(config, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def row_fingerprints(columns: Dict[str, list], names: Iterable[str]) -> List[int]:
+    """
+    计算每一行在指定输入列上的内容指纹（64 位哈希，跨会话稳定）。
+
+    :param columns: 输入列，键为 Restaurant 字段名
+    :param names: 参与计算的列名
+    :return: 与行数等长的指纹列表
+    """
+    frame = pd.DataFrame({name: pd.Series(columns[name], dtype=object) for name in names})
+    return pd.util.hash_pandas_object(frame, index=False).tolist()
+
+
+def _fill_pinyin(existing: list, source: list) -> list:
+    """与 Restaurant.fill_defaults 规则相同：已有值为空且中文不为空时填充拼音"""
+    missing = [i for i, (value, text) in enumerate(zip(existing, source)) if not value and text]
+    filled = list(existing)
+    for i, pinyin in zip(missing, convert_to_pinyin_batch([source[i] for i in missing])):
+        filled[i] = pinyin
+    return filled
+
+
+def enrich_columns(columns: Dict[str, list], steps: Iterable[str], street_matcher: StreetMatcher,
+                   type_classifier: RestaurantTypeClassifier) -> Dict[str, list]:
+    """
+    对一块数据执行富化步骤。
+
+    :param columns: 输入列，键为 Restaurant 字段名
+    :param steps: 要执行的步骤
+    :param street_matcher: 街道匹配器
+    :param type_classifier: 餐厅类型分类器
+    :return: 产出列，键为 Restaurant 字段名
+    """
+    result = {}
+    if "street" in steps:
+        result["street"] = street_matcher.match_batch(
+            columns["city"], columns["district"], columns["chinese_address"])
+    if "type" in steps:
+        result["restaurant_type"] = type_classifier.classify_batch(
+            columns["chinese_name"], columns["chinese_address"])
+    if "defaults" in steps:
+        result["english_name"] = _fill_pinyin(columns["english_name"], columns["chinese_name"])
+        result["contact_person_en"] = _fill_pinyin(columns["contact_person_en"], columns["contact_person_zh"])
+    return result
+
+
+# 进程池中每个工作进程各自持有的匹配器，由 _init_worker 构建
+_worker_street_matcher = None
+_worker_type_classifier = None
+
+
+def _init_worker(street_map: dict, type_mapping: dict):
+    global _worker_street_matcher, _worker_type_classifier
+    # fork 时继承了父进程的拼音缓存 SQLite 连接，子进程需使用自己的连接
+    pinyin_cache.reset_after_fork()
+    _worker_street_matcher = StreetMatcher(street_map)
+    _worker_type_classifier = RestaurantTypeClassifier(type_mapping)
+
+
+def _run_chunk(payload: Tuple[int, Dict[str, list], Tuple[str, ...]]):
+    index, columns, steps = payload
+    try:
+        return index, enrich_columns(columns, steps, _worker_street_matcher, _worker_type_classifier), None
+    except Exception as e:
+        return index, None, str(e)
+
+
+class EnrichmentPipeline:
+    """
+    餐厅数据富化流水线：街道匹配、餐厅类型分类和默认值（拼音）填充一次完成。
+    数据按块切分后分发到进程池并行处理，结果按原顺序拼回；某一块出错只影响该块。
+    每个步骤的结果按该步骤输入列的行指纹保存，再次运行时只重新计算输入发生变化的行；
+    保存的结果同时记录所用配置（街道图、收油关系映射）的指纹，配置修改后全部重新计算。
+    每次运行后某一步骤只保留本次数据中各行的结果，占用随表的行数而不是运行次数增长。
+    """
+
+    STEPS = ("street", "type", "defaults")
+
+    def __init__(self, street_map: dict, type_mapping: dict, workers: int = 0, chunk_size: int = 2000):
+        """
+        :param street_map: 街道图配置
+        :param type_mapping: 收油关系映射配置
+        :param workers: 进程数，0 表示使用全部 CPU 核心，1 表示在当前进程中执行
+        :param chunk_size: 每块的行数
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = max(int(chunk_size), 1)
+        self.street_map = {}
+        self.type_mapping = {}
+        self._config_fingerprints: Dict[str, str] = {}  # 步骤 -> 该步骤所用配置的指纹
+        self._street_matcher = None
+        self._type_classifier = None
+        # 步骤 -> (配置指纹, {行指纹: 该步骤的产出值})
+        self._store: Dict[str, Tuple[str, Dict[int, tuple]]] = {}
+        self.last_recomputed = 0  # 最近一次运行中重新计算的行数
+        self.configure(street_map, type_mapping)
+
+    def configure(self, street_map: dict, type_mapping: dict):
+        """
+        更新配置：内容有变化时重新编译对应的匹配器，按旧配置保存的结果不再命中。
+
+        :param street_map: 街道图配置
+        :param type_mapping: 收油关系映射配置
+        """
+        street_map, type_mapping = street_map or {}, type_mapping or {}
+        fingerprints = {"street": config_fingerprint(street_map), "type": config_fingerprint(type_mapping),
+                        "defaults": ""}
+        if fingerprints["street"] != self._config_fingerprints.get("street"):
+            self.street_map = street_map
+            self._street_matcher = None
+        if fingerprints["type"] != self._config_fingerprints.get("type"):
+            self.type_mapping = type_mapping
+            self._type_classifier = None
+        self._config_fingerprints = fingerprints
+
+    @property
+    def street_matcher(self) -> StreetMatcher:
+        if self._street_matcher is None:
+            self._street_matcher = StreetMatcher(self.street_map)
+        return self._street_matcher
+
+    @property
+    def type_classifier(self) -> RestaurantTypeClassifier:
+        if self._type_classifier is None:
+            self._type_classifier = RestaurantTypeClassifier(self.type_mapping)
+        return self._type_classifier
+
+    def clear_store(self):
+        """清空按行指纹保存的结果，下次运行时全部重新计算"""
+        self._store.clear()
+
+    def run(self, columns: Dict[str, list], steps: Iterable[str] = STEPS) -> Tuple[Dict[str, list], List[ChunkError]]:
+        """
+        执行富化流水线，只有输入发生变化（指纹未命中）的行会重新计算。
+
+        :param columns: 输入列，键为 Restaurant 字段名，至少包含 steps 所需的列
+        :param steps: 要执行的步骤，取值见 STEPS
+        :return: (产出列, 出错的数据块列表)；出错块中的街道/类型为 None，默认值保持原值
+        """
+        steps = tuple(step for step in self.STEPS if step in set(steps))
+        n_rows = len(next(iter(columns.values()), []))
+        fingerprints = {step: row_fingerprints(columns, STEP_INPUTS[step]) for step in steps}
+        stores = {step: self._step_store(step) for step in steps}
+        misses = [
+            row for row in range(n_rows)
+            if any(fingerprints[step][row] not in stores[step] for step in steps)
+        ]
+        self.last_recomputed = len(misses)
+
+        changed_columns = {name: [values[row] for row in misses] for name, values in columns.items()}
+        computed, errors = self._run_rows(changed_columns, steps)
+        failed = set()
+        for i, error in enumerate(errors):
+            failed.update(misses[error.start:error.stop])
+            errors[i] = error._replace(start=misses[error.start], stop=misses[error.stop - 1] + 1)
+
+        outputs = {}
+        for step in steps:
+            names = STEP_OUTPUTS[step]
+            values = [stores[step].get(fingerprint) for fingerprint in fingerprints[step]]
+            for position, row in enumerate(misses):
+                values[row] = tuple(computed[name][position] for name in names)
+            # 只保留本次数据中各行的结果（出错块的行不保存）
+            self._store[step] = (self._config_fingerprints[step], {
+                fingerprint: value for row, (fingerprint, value) in enumerate(zip(fingerprints[step], values))
+                if row not in failed
+            })
+            for k, name in enumerate(names):
+                outputs[name] = [value[k] for value in values]
+        return outputs, errors
+
+    def _step_store(self, step: str) -> Dict[int, tuple]:
+        """某一步骤在当前配置下保存的结果，配置已修改时为空"""
+        config, store = self._store.get(step, ("", {}))
+        return store if config == self._config_fingerprints[step] else {}
+
+    def _run_rows(self, columns: Dict[str, list], steps: Tuple[str, ...]) -> Tuple[Dict[str, list], List[ChunkError]]:
+        """对给定的行分块执行各步骤，错误块的行号为 columns 中的位置"""
+        needed = sorted({name for step in steps for name in STEP_INPUTS[step]})
+        n_rows = len(next(iter(columns.values()), []))
+        bounds = [(start, min(start + self.chunk_size, n_rows)) for start in range(0, n_rows, self.chunk_size)]
+        payloads = [
+            (index, {name: columns[name][start:stop] for name in needed}, steps)
+            for index, (start, stop) in enumerate(bounds)
+        ]
+
+        chunk_results = self._run_payloads(payloads)
+
+        outputs = {name: [] for step in steps for name in STEP_OUTPUTS[step]}
+        errors = []
+        for index, result, message in chunk_results:
+            start, stop = bounds[index]
+            if result is None:
+                errors.append(ChunkError(index, start, stop, message))
+                result = {name: columns[name][start:stop] if name in columns else [None] * (stop - start)
+                          for name in outputs}
+            for name in outputs:
+                outputs[name].extend(result[name])
+        return outputs, errors
+
+    def _run_payloads(self, payloads: list) -> list:
+        if self.workers > 1 and len(payloads) > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=min(self.workers, len(payloads)), initializer=_init_worker,
+                                         initargs=(self.street_map, self.type_mapping)) as executor:
+                    return list(executor.map(_run_chunk, payloads))  # map 保证结果顺序与输入一致
+            except (BrokenProcessPool, OSError):
+                # 进程池不可用时（例如受限环境）退回到当前进程执行
+                pass
+
+        results = []
+        for index, columns, steps in payloads:
+            try:
+                results.append((index, enrich_columns(columns, steps, self.street_matcher, self.type_classifier), None))
+            except Exception as e:
+                results.append((index, None, str(e)))
+        return results
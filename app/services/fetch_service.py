@@ -0,0 +1,173 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+from app.config import CONF
+from app.services.http_service import ProviderStatusError
+from app.utils.file_io import rp
+from app.utils.logger import setup_logger
+from app.utils.rate_limit import TokenBucket
+from app.utils.response_cache import ResponseCache, normalize_request
+
+
+class PageResult(NamedTuple):
+    """单页查询结果：本页的记录，以及服务商是否表示这已是最后一页"""
+    records: List[dict]
+    is_last: bool
+
+
+# 未配置时各服务商的默认限流（每秒请求数, 突发请求数）
+DEFAULT_RATE_LIMITS = {
+    "gaode": (3, 3),
+    "baidu": (3, 3),
+    "google": (0.5, 1),
+}
+
+# 地图查询结果的磁盘缓存，配置见 SYSTEM.map_cache
+response_cache = ResponseCache(
+    rp("map_responses.sqlite", folder=["var", "cache"]) if CONF.get("SYSTEM.map_cache.enabled", True) else None,
+    ttl=CONF.get("SYSTEM.map_cache.ttl_hours", 168) * 3600,
+    max_bytes=int(CONF.get("SYSTEM.map_cache.max_mb", 256) * 1024 * 1024),
+    offline=bool(CONF.get("SYSTEM.map_cache.offline", False)),
+)
+
+_limiters: Dict[str, TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> TokenBucket:
+    """
+    获取服务商共享的限流器，同一服务商的所有查询（不同关键字、不同页）共用一个令牌桶。
+    限流参数读取配置 SYSTEM.map_rate_limits.<provider>.qps / burst。
+
+    :param provider: 服务商名称，gaode / baidu / google
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            default_qps, default_burst = DEFAULT_RATE_LIMITS.get(provider, (1, 1))
+            qps = CONF.get(f"SYSTEM.map_rate_limits.{provider}.qps", default_qps)
+            burst = CONF.get(f"SYSTEM.map_rate_limits.{provider}.burst", default_burst)
+            limiter = TokenBucket(default_qps if qps is None else qps, default_burst if burst is None else burst)
+            _limiters[provider] = limiter
+        return limiter
+
+
+class PageFetcher:
+    """
+    分页查询引擎：在限流器允许的速率内并发请求多页，结果按页码顺序拼接。
+    某一页表示已是最后一页后不再发起更后面的请求，已发出的更后面页的结果被丢弃，
+    因此返回的记录与逐页顺序查询完全一致。
+    给定缓存时，命中缓存的页不占用限流令牌，只有带记录的页会写入缓存；离线模式下未缓存的页视为没有更多结果。
+    服务商返回错误 status（key 无效、配额用尽等）的页视为没有更多结果：记入 status_errors 并停止翻页，
+    不回调 on_page，也不缓存；其他错误（网络、HTTP）仍然抛出。
+    """
+
+    def __init__(self, limiter: TokenBucket, concurrency: int = 4, provider: str = "",
+                 cache: Optional[ResponseCache] = None):
+        """
+        :param limiter: 限流器
+        :param concurrency: 同时在途的最大请求数
+        :param provider: 服务商名称，作为缓存键的一部分
+        :param cache: 查询结果缓存，为 None 时不缓存
+        """
+        self.limiter = limiter
+        self.concurrency = max(int(concurrency), 1)
+        self.provider = provider
+        self.cache = cache
+        self.status_errors: List[ProviderStatusError] = []  # 服务商返回错误 status 而停止翻页的记录
+        self.logger = setup_logger("moco.log")
+
+    def fetch(self, pages: Sequence, fetch_page: Callable[[object], PageResult],
+              on_page: Optional[Callable[[int, PageResult], None]] = None, collect: bool = True) -> List[dict]:
+        """
+        同步接口，内部运行事件循环。
+
+        :param pages: 每一页的请求参数（URL 或参数字典），按页码排列
+        :param fetch_page: 阻塞的单页查询函数，在线程池中执行
+        :param on_page: 每得到一页结果（含缓存命中）时的回调，参数为该页在 pages 中的位置和结果
+        :param collect: 是否保留并返回全部记录；只通过 on_page 流式处理时传 False，返回空列表
+        :return: 所有页的记录
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.fetch_async(pages, fetch_page, on_page, collect))
+        # 当前线程已有运行中的事件循环时，在独立线程中运行
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self.fetch_async(pages, fetch_page, on_page, collect)).result()
+
+    async def fetch_async(self, pages: Sequence, fetch_page: Callable[[object], PageResult],
+                          on_page: Optional[Callable[[int, PageResult], None]] = None,
+                          collect: bool = True) -> List[dict]:
+        """异步接口，参数同 fetch；某一页请求失败时（且在最后一页之前）抛出该页的异常"""
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.concurrency)
+        results: list = [None] * len(pages)
+        last_index = len(pages)  # 已知的最后一页的位置
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            async def run(index: int, page):
+                nonlocal last_index
+                try:
+                    result = await loop.run_in_executor(executor, fetch_page, page)
+                except ProviderStatusError as e:
+                    # 重试无法恢复，当作最后一页：保留之前各页的结果，其他关键字/服务商照常抓取
+                    self.status_errors.append(e)
+                    self.logger.warning(f"[{self.provider}] 第 {index + 1} 页返回错误，停止翻页：{e}")
+                    results[index] = PageResult([], True)
+                    last_index = min(last_index, index)
+                    return
+                except Exception as e:
+                    results[index] = e
+                    return
+                finally:
+                    slots.release()
+                results[index] = result if collect else result._replace(records=[])
+                if result.is_last:
+                    last_index = min(last_index, index)
+                # 只缓存有记录的页：出错的页已在 fetch_page 中抛出异常，空页可能来自未识别的错误响应，
+                # 缓存后会在有效期内一直被当作“没有更多结果”；不缓存空页只多一次请求
+                if self.cache is not None and result.records:
+                    self.cache.put(self.provider, page, result._asdict())
+                if on_page is not None:
+                    on_page(index, result)
+
+            tasks = []
+            for index, page in enumerate(pages):
+                if index > last_index:
+                    break
+                cached = self._cached(page)
+                if cached is not None:
+                    results[index] = cached if collect else cached._replace(records=[])
+                    if cached.is_last:
+                        last_index = min(last_index, index)
+                    if on_page is not None:
+                        on_page(index, cached)
+                    continue
+                await slots.acquire()
+                if index <= last_index:
+                    await self.limiter.acquire()
+                if index > last_index:
+                    slots.release()
+                    break
+                tasks.append(asyncio.ensure_future(run(index, page)))
+            await asyncio.gather(*tasks)
+
+        records = []
+        for result in results[:last_index + 1]:
+            if isinstance(result, Exception):
+                raise result
+            records.extend(result.records)
+        return records
+
+    def _cached(self, page) -> Optional[PageResult]:
+        if self.cache is None:
+            return None
+        payload = self.cache.get(self.provider, page)
+        if payload is not None:
+            return PageResult(payload["records"], payload["is_last"])
+        if self.cache.offline:
+            self.logger.warning(f"[{self.provider}] 离线模式下缓存未命中，停止翻页：{normalize_request(self.provider, page)}")
+            return PageResult([], True)
+        return None
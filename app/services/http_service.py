@@ -0,0 +1,237 @@
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from app.config import CONF
+from app.utils.logger import setup_logger
+
+
+class TransportError(Exception):
+    """请求在重试后仍然失败，或返回了不可重试的错误"""
+
+    def __init__(self, provider: str, url: str, message: str):
+        self.provider = provider
+        self.url = url
+        super().__init__(f"[{provider}] {message}（{url}）")
+
+
+class ProviderStatusError(TransportError):
+    """服务商在响应体中返回了错误 status（key 无效、配额用尽、参数错误等），重试无法恢复"""
+
+
+class ProviderStats:
+    """单个服务商的请求统计"""
+
+    __slots__ = ("requests", "retries", "failures", "status_errors", "latency_total", "latency_max")
+
+    def __init__(self):
+        self.requests = 0  # 实际发出的请求数（含重试）
+        self.retries = 0
+        self.failures = 0  # 重试耗尽或不可重试而失败的调用数
+        self.status_errors = 0  # 其中服务商返回错误 status 的次数
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def record(self, latency: float):
+        self.requests += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+
+    def snapshot(self) -> dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "status_errors": self.status_errors,
+            "latency_avg": self.latency_total / self.requests if self.requests else 0.0,
+            "latency_max": self.latency_max,
+        }
+
+
+class HttpTransport:
+    """
+    地图与地理编码接口共用的 HTTP 传输层。
+    每个主机一个保持长连接的 Session（连接池），所有请求带连接/读取超时；
+    遇到 429、5xx、网络错误以及服务商的限流错误码时按指数退避重试；
+    按服务商统计请求数、重试数和耗时。
+    """
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+    # 服务商在 HTTP 200 的响应体中返回的、稍后重试即可恢复的错误码
+    QUOTA_CODES = {
+        # 高德 infocode：访问过于频繁、QPS 超限、网关超时、服务繁忙
+        "gaode": {"10004", "10014", "10015", "10016", "10019", "10020", "10021"},
+        # 百度 status：服务器内部错误、并发量超限
+        "baidu": {"1", "401"},
+    }
+    # 服务商响应体中表示请求成功的 status，其余取值（key 无效、参数错误、无权限、配额用尽等）均为错误
+    SUCCESS_STATUS = {"gaode": "1", "baidu": "0"}
+
+    def __init__(self, connect_timeout: float = 5, read_timeout: float = 20, max_retries: int = 4,
+                 backoff_base: float = 0.5, backoff_max: float = 8, pool_size: int = 8):
+        """
+        :param connect_timeout: 连接超时（秒）
+        :param read_timeout: 读取超时（秒）
+        :param max_retries: 最多重试次数
+        :param backoff_base: 第一次重试前的等待时间（秒），之后每次翻倍
+        :param backoff_max: 单次等待的上限（秒）
+        :param pool_size: 每个主机的连接池大小
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max(int(max_retries), 0)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self.logger = setup_logger("moco.log")
+        self._sessions: Dict[str, requests.Session] = {}
+        self._stats: Dict[str, ProviderStats] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config=CONF) -> "HttpTransport":
+        """按配置 SYSTEM.http 创建"""
+        return cls(
+            connect_timeout=config.get("SYSTEM.http.connect_timeout", 5),
+            read_timeout=config.get("SYSTEM.http.read_timeout", 20),
+            max_retries=config.get("SYSTEM.http.max_retries", 4),
+            backoff_base=config.get("SYSTEM.http.backoff_base", 0.5),
+            backoff_max=config.get("SYSTEM.http.backoff_max", 8),
+            pool_size=config.get("SYSTEM.http.pool_size", 8),
+        )
+
+    def session(self, host: str) -> requests.Session:
+        """获取主机对应的 Session，不存在时创建"""
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[host] = session
+            return session
+
+    def stats(self) -> Dict[str, dict]:
+        """各服务商的统计快照"""
+        with self._lock:
+            return {provider: stats.snapshot() for provider, stats in self._stats.items()}
+
+    def close(self):
+        """关闭所有 Session"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    def get_json(self, provider: str, url: str, params: Optional[dict] = None) -> dict:
+        """
+        发送 GET 请求并解析 JSON 响应，必要时重试。
+
+        :param provider: 服务商名称（gaode / baidu / google），用于统计和识别限流错误码
+        :param url: 请求地址
+        :param params: 查询参数
+        :return: 响应 JSON
+        :raises TransportError: 重试耗尽、HTTP 错误不可重试或响应不是 JSON
+        """
+        session = self.session(urlsplit(url).netloc)
+        reason = ""
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            start = time.perf_counter()
+            try:
+                response = session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(provider, time.perf_counter() - start)
+                reason = f"网络错误：{e}"
+            else:
+                self._record(provider, time.perf_counter() - start)
+                if response.status_code in self.RETRY_STATUS:
+                    reason = f"HTTP {response.status_code}"
+                    retry_after = self._retry_after(response)
+                elif not response.ok:
+                    self._fail(provider)
+                    raise TransportError(provider, url, f"HTTP {response.status_code}")
+                else:
+                    try:
+                        data = response.json()
+                    except ValueError:
+                        self._fail(provider)
+                        raise TransportError(provider, url, "响应不是有效的 JSON")
+                    code = self._quota_code(provider, data)
+                    if code is None:
+                        return data
+                    reason = f"限流错误码 {code}"
+
+            if attempt == self.max_retries:
+                break
+            delay = self._backoff(attempt, retry_after)
+            self.logger.warning(f"[{provider}] 请求失败（{reason}），{delay:.1f} 秒后第 {attempt + 1} 次重试")
+            with self._lock:
+                self._provider_stats(provider).retries += 1
+            time.sleep(delay)
+
+        self._fail(provider)
+        raise TransportError(provider, url, f"重试 {self.max_retries} 次后仍失败：{reason}")
+
+    def check_status(self, provider: str, url: str, data: dict) -> dict:
+        """
+        检查服务商在响应体中返回的 status，成功时原样返回 data。
+
+        :raises ProviderStatusError: status 不是成功值
+        """
+        expected = self.SUCCESS_STATUS.get(provider)
+        if expected is None or not isinstance(data, dict):
+            return data
+        status = data.get("status")
+        if status is not None and str(status) == expected:
+            return data
+        if provider == "gaode":
+            detail = f"{data.get('info')}（infocode {data.get('infocode')}）"
+        else:
+            detail = data.get("message")
+        self._fail(provider, status_error=True)
+        raise ProviderStatusError(provider, url, f"服务商返回错误 status={status}：{detail}")
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> Optional[float]:
+        try:
+            return float(response.headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            return None
+
+    def _quota_code(self, provider: str, data) -> Optional[str]:
+        codes = self.QUOTA_CODES.get(provider)
+        if not codes or not isinstance(data, dict):
+            return None
+        code = data.get("infocode") if provider == "gaode" else data.get("status")
+        code = None if code is None else str(code)
+        return code if code in codes else None
+
+    def _provider_stats(self, provider: str) -> ProviderStats:
+        stats = self._stats.get(provider)
+        if stats is None:
+            stats = self._stats[provider] = ProviderStats()
+        return stats
+
+    def _record(self, provider: str, latency: float):
+        with self._lock:
+            self._provider_stats(provider).record(latency)
+
+    def _fail(self, provider: str, status_error: bool = False):
+        with self._lock:
+            stats = self._provider_stats(provider)
+            stats.failures += 1
+            if status_error:
+                stats.status_errors += 1
+
+
+http_transport = HttpTransport.from_config()
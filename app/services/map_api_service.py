@@ -1,15 +1,29 @@
-import json
-import requests
-import time
-import xlwt
 import re
-from serpapi import GoogleSearch
 from geopy.geocoders import Nominatim
 import pandas as pd
+from app.config import CONF
+from app.services.fetch_service import PageFetcher, PageResult, get_rate_limiter, response_cache
+from app.services.http_service import http_transport
+from app.utils.coords import PROVIDER_DATUMS, WGS84, GCJ02, BD09, convert_coordinates
+from app.utils.record_writer import open_record_writer
+
+SERPAPI_URL = "https://serpapi.com/search"
+
+# 写出抓取结果时的列：记录的键 -> 表头
+RESULT_COLUMNS = {'name': '店名', 'address': '地址', 'tel': '电话', 'location': '坐标', 'adname': '所属区县',
+                  'type': '类型', 'distance': '距离', 'cityname': '城市', 'sources': '来源'}
+GOOGLE_RESULT_COLUMNS = {'name': '店名', 'address': '地址', 'tel': '电话'}
 
 ## 高德、百度、serp调用谷歌地图
 class RestaurantInfo:
-    def __init__(self, n, token, keywords, address, maptype,filename):
+    # 地图类型 -> 服务商名称（限流、缓存、统计中使用）
+    PROVIDERS = {1: "gaode", 2: "baidu", 3: "google"}
+
+    def __init__(self, n, token, keywords, address, maptype,filename, address_datum=None):
+        """
+        :param address_datum: address 为坐标时其所属坐标系（如 Nominatim 返回的 WGS84），
+                              给定时先转换到地图服务商的坐标系；为 None 时按原样使用
+        """
         self.n = n  # 获取多少页
         self.key = token
         if maptype ==1 :
@@ -23,6 +37,13 @@ class RestaurantInfo:
         self.maptype = maptype
         self.filename = filename
         loc = re.match("@?[-+]?\d+(\.\d+)?,\d+(\.\d+)?", self.address)
+        provider_datum = PROVIDER_DATUMS.get(self.PROVIDERS.get(maptype))
+        if loc and address_datum and provider_datum and address_datum != provider_datum and maptype != 3:
+            # 国内坐标纬度小于经度，转换后仍按 '纬度,经度' 交给下面的顺序处理
+            p1, p2 = (float(v) for v in address.lstrip("@").split(",")[:2])
+            (lon,), (lat,) = convert_coordinates([max(p1, p2)], [min(p1, p2)], address_datum, provider_datum)
+            address = f"{lat:.6f},{lon:.6f}"
+            self.address = address
         if loc:
             gps = address.split(",")
             p1 = float(gps[0])
@@ -114,133 +135,102 @@ class RestaurantInfo:
             "start":i*20})  # 谷歌地图分页参数，0-第一页，20-第二页，40-第三页
         return params_list
         
+    def page_fetcher(self, provider: str) -> PageFetcher:
+        return PageFetcher(get_rate_limiter(provider), CONF.get("SYSTEM.map_fetch_concurrency", 4),
+                           provider=provider, cache=response_cache)
+
+    @staticmethod
+    def gaode_records(pois) -> list:
+        """高德 POI 转换为餐厅记录，坐标为 GCJ-02 的 '经度,纬度'，source 记录数据来源"""
+        return [{'name': i.get('name'), 'address': i.get('address'), 'tel': i.get('tel'),
+                 'location': i.get('location'), 'adname': i.get('adname'), 'type': i.get('type'),
+                 'distance': i.get('distance'), 'cityname': i.get('cityname'), 'datum': GCJ02,
+                 'source': 'gaode'} for i in pois]
+
+    @staticmethod
+    def baidu_records(results) -> list:
+        """百度 POI 转换为餐厅记录，坐标为 BD-09 的 '经度,纬度'"""
+        return [{'name': i.get('name'), 'address': i.get('address'), 'tel': i.get('telephone'),
+                 'location': RestaurantInfo._baidu_location(i.get('location')), 'datum': BD09,
+                 'source': 'baidu'} for i in results]
+
+    @staticmethod
+    def _baidu_location(location):
+        if not isinstance(location, dict) or location.get('lng') is None or location.get('lat') is None:
+            return None
+        return f"{location['lng']},{location['lat']}"
+
+    @staticmethod
+    def _fetch_gaode_page(url) -> PageResult:
+        res = http_transport.check_status("gaode", url, http_transport.get_json("gaode", url))
+        l = res.get('pois')
+        if l is None or len(l) == 0:
+            return PageResult([], True)
+        return PageResult(RestaurantInfo.gaode_records(l), len(l) < 20)  ## 当最后一次小于20的话说明最后一页，退出
+
+    @staticmethod
+    def _fetch_baidu_page(url) -> PageResult:
+        res = http_transport.check_status("baidu", url, http_transport.get_json("baidu", url))
+        l = res.get('results')
+        if l is None or len(l) == 0:
+            return PageResult([], True)
+        return PageResult(RestaurantInfo.baidu_records(l), False)
+
+    @staticmethod
+    def _fetch_google_page(params) -> PageResult:
+        res = http_transport.get_json("google", SERPAPI_URL, params={**params, "output": "json"})
+        l = res.get("local_results")  # 没有更多结果时 SerpAPI 返回 error 而不是 local_results
+        if l is None or len(l) == 0:
+            return PageResult([], True)
+        datalist = [{'name': i.get('title'), 'address': i.get('address'), 'tel': i.get('phone'), 'datum': WGS84, 'source': 'google'
+                    #  ,'type':i.get('type'),'types':i.get('types'),'latitude':i.get("gps_coordinates")['latitude'],
+                    # 'longitude':i.get("gps_coordinates")['longitude'],
+                    # 'rating':i.get('rating'),'reviews':i.get('reviews'),
+                    # 'open_state':i.get('open_state'),
+                    # "operating_hours":i.get('operating_hours'),
+                    # "service_options":i.get('service_options')
+                    } for i in l]
+        return PageResult(datalist, False)
+
+    # 各页在限流范围内并发请求，遇到最后一页后停止
     def get_gaode_restaurant(self, urls):
-        j = 0
-        datalist = []
-        for url in urls:
-            # print(url)
-            res = requests.request('GET', url=url)
-            time.sleep(1)
-            res = json.loads(res.text)
-            l = res.get('pois')
-            if l is not None and len(l)>0:
-                for i in l:
-                    print(i)
-                    j += 1
-                    print(j)
-                    dict1 = {'name': i.get('name'), 'address': i.get('address'), 'tel': i.get('tel'), 'location': i.get('location'), 'adname': i.get('adname'), 'type': i.get('type'), 'distance': i.get('distance'), 'cityname': i.get('cityname')}
-                    datalist.append(dict1)
-                if len(l)<20: ## 当最后一次小于20的话说明最后一页，退出
-                    break
-            else:
-                break
-        return datalist
+        return self.page_fetcher("gaode").fetch(urls, self._fetch_gaode_page)
 
     def get_baidu_restaurant(self, urls):
-        j = 0
-        datalist = []
-        for url in urls:
-            print(url)
-            res = requests.request('GET', url=url)
-            time.sleep(1)
-            res = json.loads(res.text)
-            l = res.get('results')
-            # print(l)
-            if l is not None and len(l)>0:
-                
-                for i in l:
-                    print(i)
-                    j += 1
-                    print(j)
-                    dict1 = {'name': i.get('name'), 'address': i.get('address'),
-                            'tel': i.get('telephone')}
-                    datalist.append(dict1)
-            else:
-                break
-        return datalist
+        return self.page_fetcher("baidu").fetch(urls, self._fetch_baidu_page)
 
     def get_google_restaurant(self, params_list):
-        j = 0
-        datalist = []
-        for params in params_list:
-            print(params)
-            try:
-                search = GoogleSearch(params)
-                res = search.get_dict()
-                time.sleep(10)
-                l = res["local_results"]
-            # print(l)
-                if l is not None and len(l)>0:
-
-                    for i in l:
-                        print()
-                        j += 1
-                        print(j)
-                        dict1 = {'name': i.get('title'), 'address': i.get('address'),'tel': i.get('phone')
-                                #  ,'type':i.get('type'),'types':i.get('types'),'latitude':i.get("gps_coordinates")['latitude'],
-                                # 'longitude':i.get("gps_coordinates")['longitude'],
-                                # 'rating':i.get('rating'),'reviews':i.get('reviews'),
-                                # 'open_state':i.get('open_state'),
-                                # "operating_hours":i.get('operating_hours'),
-                                # "service_options":i.get('service_options')
-                                }
-                        datalist.append(dict1)
-                else:
-                    break  
-            except:
-                break
-        return datalist
+        return self.page_fetcher("google").fetch(params_list, self._fetch_google_page)
 
 
     def write_to_excel(self, datalist, filename):
-        # 一个Workbook对象，这就相当于创建了一个Excel文件
-        book = xlwt.Workbook( style_compression=0)
-        sheet = book.add_sheet('餐厅', cell_overwrite_ok=True)
-
-        sheet.write(0, 0, '店名')
-        sheet.write(0, 1, '地址')
-        sheet.write(0, 2, '电话')
-        sheet.write(0, 3, '坐标')
-        sheet.write(0, 4, '所属区县')
-        sheet.write(0, 5, '类型')
-        sheet.write(0, 6, '距离')
-        sheet.write(0, 7, '城市')
-
-
-        for i in range(len(datalist)):
-            sheet.write(i + 1, 0, datalist[i]['name'])
-            sheet.write(i + 1, 1, datalist[i]['address'])
-            sheet.write(i + 1, 2, datalist[i]['tel'])
-            sheet.write(i + 1, 3, datalist[i]['location'])
-            sheet.write(i + 1, 4, datalist[i]['adname'])
-            sheet.write(i + 1, 5, datalist[i]['type'])
-            sheet.write(i + 1, 6, datalist[i]['distance'])
-            sheet.write(i + 1, 7, datalist[i]['cityname'])
-
-        book.save(filename)  # r'东莞市.xlsx'
+        """流式写出记录，按扩展名输出 xlsx / csv / parquet"""
+        with open_record_writer(filename, RESULT_COLUMNS, sheet_name='餐厅') as writer:
+            writer.write_many(datalist)
         print('save success')
 
 
     ## google
     def write_to_excel_google(self, datalist, filename):
-
-        book = xlwt.Workbook(encoding='utf-8', style_compression=0)
-        sheet = book.add_sheet('餐厅', cell_overwrite_ok=True)
-        column_title = ['店名','地址','电话'
-                        # ,'餐厅类型','餐厅类型_多类','餐厅纬度','餐厅经度','餐厅评分','餐厅评论数','餐厅营业时间',
-                        # '餐厅每天营业时间','提供的服务类型'
-                        ]
-        for i in range(len(column_title)):
-            sheet.write(0,i,column_title[i])
-        for i in range(len(datalist)):
-            j=0
-            for value in datalist[i].values():
-                sheet.write(i + 1, 0+j, str(value))
-                j = j+1
-
-        book.save(filename)  # r'东莞市.xlsx'
+        with open_record_writer(filename, GOOGLE_RESULT_COLUMNS, sheet_name='餐厅') as writer:
+            writer.write_many(datalist)
         print('save success')
 
+    def page_plan(self):
+        """
+        按地图类型和地址（行政区划或坐标）生成分页查询计划。
+
+        :return: (服务商名称, 各页请求, 单页查询函数)
+        """
+        loc = re.match("@?[-+]?\d+(\.\d+)?,\d+(\.\d+)?", self.address)
+        if self.maptype == 1:
+            return "gaode", self.create_gaode_around_url() if loc else self.create_gaode_url(), self._fetch_gaode_page
+        if self.maptype == 2:
+            return "baidu", self.create_baidu_around_url() if loc else self.create_baidu_url(), self._fetch_baidu_page
+        if self.maptype == 3:
+            return "google", self.create_google_around_url() if loc else self.create_google_url(), self._fetch_google_page
+        raise ValueError(f"不支持的地图类型：{self.maptype}")
+
     def get_info_write_file(self):
         # 如果是输入的坐标，直接匹配周边搜索
         loc = re.match("@?[-+]?\d+(\.\d+)?,\d+(\.\d+)?", self.address)
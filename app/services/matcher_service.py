@@ -0,0 +1,120 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.utils.matcher import AhoCorasick
+
+
+class StreetMatcher:
+    """
+    街道匹配器。
+    将 街道图 中每个 城市/区域 的街道列表预先编译为 Aho-Corasick 自动机，
+    匹配地址时只需扫描一遍地址字符串。
+    地址中同时出现多个街道时取名称最长的街道，长度相同时取配置中靠前的街道。
+    """
+
+    def __init__(self, street_map: Optional[dict]):
+        """
+        :param street_map: 街道图配置，结构为 {城市: {区域: [街道, ...]}}
+        """
+        self._automata: Dict[Tuple[str, str], Tuple[AhoCorasick, List[Tuple[int, int]]]] = {}
+        for city, districts in (street_map or {}).items():
+            if not isinstance(districts, dict):
+                continue
+            for district, streets in districts.items():
+                if streets:
+                    self._automata[(city, district)] = self._compile(streets)
+
+    @staticmethod
+    def _compile(streets: list) -> Tuple[AhoCorasick, List[Tuple[int, int]]]:
+        """编译单个区域的街道列表，并为每个街道计算排序键（越小越优先）"""
+        unique_streets = list(dict.fromkeys(str(street) for street in streets if street))
+        ranks = [(-len(street), position) for position, street in enumerate(unique_streets)]
+        return AhoCorasick(unique_streets), ranks
+
+    def match(self, city: str, district: str, address: str) -> Optional[str]:
+        """
+        从地址中匹配街道名。
+
+        :param city: 城市名称
+        :param district: 区域名称
+        :param address: 完整地址字符串
+        :return: 匹配到的街道名，未配置该区域或未匹配到时返回 None
+        """
+        compiled = self._automata.get((city, district))
+        if compiled is None or not isinstance(address, str):
+            return None
+        automaton, ranks = compiled
+        matched_ids = automaton.find_ids(address)
+        if not matched_ids:
+            return None
+        return automaton.patterns[min(matched_ids, key=ranks.__getitem__)]
+
+    def match_batch(self, cities: Iterable[str], districts: Iterable[str],
+                    addresses: Iterable[str]) -> List[Optional[str]]:
+        """
+        批量匹配整列地址。
+
+        :param cities: 城市列
+        :param districts: 区域列
+        :param addresses: 地址列
+        :return: 与输入等长的街道名列表
+        """
+        return [self.match(city, district, address)
+                for city, district, address in zip(cities, districts, addresses)]
+
+
+class RestaurantTypeClassifier:
+    """
+    餐厅类型分类器。
+    将 收油关系映射 中全部关键字编译为一个自动机，并预先计算每个关键字组的最大收油桶数。
+    名称或地址命中多个关键字组时，取最大桶数最大的组，相同时取配置中靠前的组。
+    """
+
+    # 拼接名称和地址时使用的分隔符，关键字中不会出现，因此不会跨越两段文本命中
+    _SEPARATOR = "\x00"
+
+    def __init__(self, type_mapping: Optional[dict]):
+        """
+        :param type_mapping: 收油关系映射配置，结构为 {"关键字1/关键字2": "1,2"}
+        """
+        self.groups: List[str] = []
+        self._max_values: List[int] = []
+        keyword_groups: Dict[str, List[int]] = {}
+
+        for group_index, (keywords, values) in enumerate((type_mapping or {}).items()):
+            try:
+                max_value = max(int(v) for v in str(values).split(","))
+            except ValueError:
+                raise ValueError(f"收油关系映射 中的 '{keywords}' 值 '{values}' 无效，必须是整数或用逗号分隔的整数。")
+            self.groups.append(keywords)
+            self._max_values.append(max_value)
+            for keyword in str(keywords).split("/"):
+                keyword_groups.setdefault(keyword, []).append(group_index)
+
+        keywords = list(keyword_groups.keys())
+        self._keyword_groups = [keyword_groups[keyword] for keyword in keywords]
+        self._automaton = AhoCorasick(keywords)
+
+    def classify(self, name: str, address: str) -> Optional[str]:
+        """
+        根据餐厅名称或地址分配餐厅类型。
+
+        :param name: 餐厅名称
+        :param address: 餐厅地址
+        :return: 匹配到的关键字组（例如“酒楼/酒家/烤鱼”），未匹配到时返回 None
+        """
+        matched_groups = set()
+        for keyword_id in self._automaton.find_ids(f"{name}{self._SEPARATOR}{address}"):
+            matched_groups.update(self._keyword_groups[keyword_id])
+        if not matched_groups:
+            return None
+        best = min(matched_groups, key=lambda index: (-self._max_values[index], index))
+        return self.groups[best]
+
+    def classify_batch(self, names: Iterable[str], addresses: Iterable[str]) -> List[Optional[str]]:
+        """
+        批量分配餐厅类型。
+
+        :param names: 餐厅名称列
+        :param addresses: 餐厅地址列
+        :return: 与输入等长的关键字组列表
+        """
+        return [self.classify(name, address) for name, address in zip(names, addresses)]
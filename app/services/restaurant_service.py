@@ -1,190 +1,279 @@
 import pandas as pd
+import numpy as np
 from typing import List
 from app.models.restaurant_model import Restaurant
+from app.models.restaurant_table import RestaurantListView, compact_restaurant_frame, column_values
 from app.config import get_config
-from typing import Optional, Union
+from typing import Optional, Tuple, Union
 from app.utils.logger import setup_logger
+from app.utils.excel_cache import read_excel_cached
+from app.utils.coords import Coordinates, validate_locations
+from app.services.matcher_service import StreetMatcher, RestaurantTypeClassifier
+from app.services.enrichment_service import EnrichmentPipeline
+from app.services.address_service import AddressService
+from pydantic import TypeAdapter
 
 
 CONF = get_config()
 RESTCONF_NAME_MAP = CONF.BUSINESS.RESTAURANT.餐厅对应关系
+RESTAURANT_LIST_ADAPTER = TypeAdapter(List[Restaurant])
+# 以 category 类型存储的重复度高的文本列
+COMPACT_COLUMNS = [RESTCONF_NAME_MAP.city, RESTCONF_NAME_MAP.district, RESTCONF_NAME_MAP.province,
+                   "street", "restaurant_type"]
+
+
+def _column_values(df: pd.DataFrame, col_name: str, default) -> list:
+    """取出整列的值，列不存在时返回默认值列表"""
+    if col_name in df.columns:
+        return column_values(df[col_name])
+    return [default] * len(df)
+
 
 class RestaurantService:
 
     def __init__(self):
-        self.restaurants = []
+        self.restaurants = []  # 加载后为只读的 RestaurantListView，按需从 restaurants_df 构建餐厅对象
         self.restaurants_df = None
+        self.coordinates: Optional[Coordinates] = None  # 与 restaurants 逐行对应的 float64 纬度/经度数组，街道解析按坐标逆地理编码时直接使用
         self.logger = setup_logger("moco.log")
+        self.enrich_errors = []
+        self._pipeline = None
+
+    @property
+    def pipeline(self) -> EnrichmentPipeline:
+        """富化流水线（街道、餐厅类型、默认值），首次使用时按配置构建；每次使用前同步设置中修改过的 街道图 / 收油关系映射"""
+        street_map = CONF.get("BUSINESS.RESTAURANT.街道图", {})
+        type_mapping = CONF.get("BUSINESS.RESTAURANT.收油关系映射", {})
+        if self._pipeline is None:
+            self._pipeline = EnrichmentPipeline(
+                street_map,
+                type_mapping,
+                workers=CONF.get("SYSTEM.enrich_workers", 0),
+                chunk_size=CONF.get("SYSTEM.enrich_chunk_size", 2000),
+            )
+        else:
+            self._pipeline.configure(street_map, type_mapping)
+        return self._pipeline
+
+    @property
+    def street_matcher(self) -> StreetMatcher:
+        """按 街道图 配置编译的街道匹配器"""
+        return self.pipeline.street_matcher
+
+    @property
+    def type_classifier(self) -> RestaurantTypeClassifier:
+        """按 收油关系映射 配置编译的餐厅类型分类器"""
+        return self.pipeline.type_classifier
     
     def load(self, file: Union[str, pd.DataFrame]) -> List[Restaurant]:
         """加载餐厅数据"""
         if isinstance(file, str):
             self.restaurants_df = self.load_df(file)
-            self.restaurants = self.load_from_df(self.restaurants_df)
         elif isinstance(file, pd.DataFrame):
             self.restaurants_df = file
-            self.restaurants = self.load_from_df(file)
+        # 只在加载时校验并构建一次餐厅对象；拼音默认值由富化流水线按块并行填充，结果直接写入表中
+        restaurants, self.coordinates = self._build_restaurants(self.restaurants_df, fill_pinyin=False)
+        self._store_table(restaurants)
+        self.enrich_batch(steps=("defaults",))
+
+    def _store_table(self, restaurants: List[Restaurant]):
+        """
+        将校验后的餐厅对象转换为紧凑的列式存储：restaurants_df 是唯一的数据副本，
+        重复度高的文本列使用 category 类型，restaurants 为按需构建对象的只读视图。
+        """
+        self.restaurants_df = compact_restaurant_frame(self.to_df(restaurants), COMPACT_COLUMNS)
+        self.restaurants = RestaurantListView(self.restaurants_df, RESTCONF_NAME_MAP._config_dict)
+
+    def _write_columns(self, values: dict):
+        """
+        把按字段名给出的整列结果直接写入 restaurants_df（不重新校验、不重新构建餐厅对象），
+        并刷新只读视图。
+
+        :param values: Restaurant 字段名 -> 与行逐一对应的值
+        """
+        for field_name, column in values.items():
+            self.restaurants_df[RESTCONF_NAME_MAP._config_dict.get(field_name, field_name)] = column
+        compact_restaurant_frame(self.restaurants_df, COMPACT_COLUMNS)
+        self.restaurants = RestaurantListView(self.restaurants_df, RESTCONF_NAME_MAP._config_dict)
 
     
     @staticmethod
     def load_df(file_path: str) -> pd.DataFrame:
-        """从 Excel 文件中加载餐厅数据并返回 DataFrame"""
-        return pd.read_excel(file_path)
+        """从 Excel 文件中加载餐厅数据并返回 DataFrame（未修改的文件只解析一次）"""
+        return read_excel_cached(file_path)
 
     @staticmethod
     def load_from_df(df: pd.DataFrame) -> List[Restaurant]:
         """从 DataFrame 中加载餐厅数据并返回餐厅对象列表"""
-        restaurants = []
-        
-        for _, row in df.iterrows():
-            other_info = {}
-
-            restaurant_data = {
-                "chinese_name": row.get(RESTCONF_NAME_MAP.chinese_name, ""),
-                "english_name": row.get(RESTCONF_NAME_MAP.english_name, None),
-                "chinese_address": row.get(RESTCONF_NAME_MAP.chinese_address, ""),
-                "english_address": row.get(RESTCONF_NAME_MAP.english_address, None),
-                "restaurant_type": row.get("restaurant_type", None),
-
-                "location": row.get(RESTCONF_NAME_MAP.location, ""),
-
-                "district": row.get(RESTCONF_NAME_MAP.district, ""),
-                "city": row.get(RESTCONF_NAME_MAP.city, ""),
-                "province": row.get(RESTCONF_NAME_MAP.province, ""),
-                "street": row.get("street", None),
-
-                "contact_person_zh": row.get(RESTCONF_NAME_MAP.contact_person_zh, ""),
-                "contact_person_en": row.get(RESTCONF_NAME_MAP.contact_person_en, None),
-                "contact_phone": str(row.get(RESTCONF_NAME_MAP.contact_phone, "")),
-                
-                "distance_km": row.get(RESTCONF_NAME_MAP.distance_km, ""),
-                "distance_mile": row.get(RESTCONF_NAME_MAP.distance_mile, None),
-            }
-            
-            # 收集其他未映射字段
-            for col_name in row.index:
-                if col_name not in list(RESTCONF_NAME_MAP._config_dict.values()):
-                    other_info[col_name] = row[col_name]
-            
-            # 初始化餐厅对象并填充默认值
-            restaurant = Restaurant(**restaurant_data, other_info=other_info)
-            restaurant.fill_defaults()
-            restaurants.append(restaurant)
-        return restaurants
+        return RestaurantService._build_restaurants(df, with_enrichment=True)[0]
     
     @staticmethod
     def load_from_excel(file_path: str) -> List[Restaurant]:
         """从 Excel 文件中批量加载餐厅数据并返回餐厅对象列表"""
-        df = pd.read_excel(file_path)
-        restaurants = []
-        
-        for _, row in df.iterrows():
-            other_info = {}
-
-            restaurant_data = {
-                "chinese_name": row.get(RESTCONF_NAME_MAP.chinese_name, ""),
-                "english_name": row.get(RESTCONF_NAME_MAP.english_name, None),
-                "chinese_address": row.get(RESTCONF_NAME_MAP.chinese_address, ""),
-                "english_address": row.get(RESTCONF_NAME_MAP.english_address, None),
-
-                "location": row.get(RESTCONF_NAME_MAP.location, ""),
-
-                "district": row.get(RESTCONF_NAME_MAP.district, ""),
-                "city": row.get(RESTCONF_NAME_MAP.city, ""),
-                "province": row.get(RESTCONF_NAME_MAP.province, ""),
-
-                "contact_person_zh": row.get(RESTCONF_NAME_MAP.contact_person_zh, ""),
-                "contact_person_en": row.get(RESTCONF_NAME_MAP.contact_person_en, None),
-                "contact_phone": str(row.get(RESTCONF_NAME_MAP.contact_phone, "")),
-                
-                "distance_km": row.get(RESTCONF_NAME_MAP.distance_km, ""),
-                "distance_mile": row.get(RESTCONF_NAME_MAP.distance_mile, None),
-            }
-            
-            # 收集其他未映射字段
-            for col_name in row.index:
-                if col_name not in list(RESTCONF_NAME_MAP._config_dict.values()) and col_name != "restaurant_type" and col_name != "street":
-                    other_info[col_name] = row[col_name]
-            
-            # 初始化餐厅对象并填充默认值
-            restaurant = Restaurant(**restaurant_data, other_info=other_info)
-            restaurant.fill_defaults()  # 自动填充默认值
-            restaurants.append(restaurant)
+        df = read_excel_cached(file_path)
+        return RestaurantService._build_restaurants(df, with_enrichment=False)[0]
+
+    @staticmethod
+    def _build_restaurants(df: pd.DataFrame, with_enrichment: bool = True,
+                           fill_pinyin: bool = True) -> Tuple[List[Restaurant], Coordinates]:
+        """
+        按列批量构建餐厅对象：整列完成字段映射，一次性校验后再批量填充默认值。
         
-        return restaurants
+        :param df: 原始餐厅数据
+        :param with_enrichment: 是否读取 restaurant_type / street 列（从 Excel 直接加载时不读取）
+        :param fill_pinyin: 是否填充拼音默认值（load 中改由富化流水线填充）
+        :return: (餐厅对象列表, 解析后的坐标数组)
+        """
+        n_rows = len(df)
+        columns = {
+            "chinese_name": _column_values(df, RESTCONF_NAME_MAP.chinese_name, ""),
+            "english_name": _column_values(df, RESTCONF_NAME_MAP.english_name, None),
+            "chinese_address": _column_values(df, RESTCONF_NAME_MAP.chinese_address, ""),
+            "english_address": _column_values(df, RESTCONF_NAME_MAP.english_address, None),
+
+            "location": _column_values(df, RESTCONF_NAME_MAP.location, ""),
+
+            "district": _column_values(df, RESTCONF_NAME_MAP.district, ""),
+            "city": _column_values(df, RESTCONF_NAME_MAP.city, ""),
+            "province": _column_values(df, RESTCONF_NAME_MAP.province, ""),
+
+            "contact_person_zh": _column_values(df, RESTCONF_NAME_MAP.contact_person_zh, ""),
+            "contact_person_en": _column_values(df, RESTCONF_NAME_MAP.contact_person_en, None),
+            "contact_phone": [str(v) for v in _column_values(df, RESTCONF_NAME_MAP.contact_phone, "")],
+
+            "distance_km": _column_values(df, RESTCONF_NAME_MAP.distance_km, ""),
+            "distance_mile": _column_values(df, RESTCONF_NAME_MAP.distance_mile, None),
+        }
+        if with_enrichment:
+            columns["restaurant_type"] = _column_values(df, "restaurant_type", None)
+            columns["street"] = _column_values(df, "street", None)
+
+        # 收集其他未映射字段（映射列集合只计算一次）
+        mapped_columns = set(RESTCONF_NAME_MAP._config_dict.values())
+        if not with_enrichment:
+            mapped_columns.update(("restaurant_type", "street"))
+        other_columns = [col for col in df.columns if col not in mapped_columns]
+        if other_columns:
+            other_infos = df[other_columns].to_dict("records")
+        else:
+            other_infos = [{} for _ in range(n_rows)]
+
+        keys = list(columns.keys())
+        records = [
+            dict(zip(keys, values), other_info=other_info)
+            for values, other_info in zip(zip(*columns.values()), other_infos)
+        ]
+
+        # 坐标整列解析校验（汇总所有错误行），其余字段整表一次性校验，然后批量填充默认值
+        coordinates = validate_locations(columns["location"])
+        restaurants = RESTAURANT_LIST_ADAPTER.validate_python(records, context={"locations_checked": True})
+        Restaurant.fill_defaults_batch(restaurants, pinyin=fill_pinyin)
+        return restaurants, coordinates
 
 
     @staticmethod
     def save_to_excel(restaurants: List[Restaurant], file_path: str):
         """将餐厅数据保存到 Excel 文件"""
-        data = [restaurant.model_dump_with_mapping() for restaurant in restaurants]
-        df = pd.DataFrame(data)
+        df = RestaurantService.to_df(restaurants)
         df.to_excel(file_path, index=False)
+
+    @staticmethod
+    def to_df(restaurants: List[Restaurant]) -> pd.DataFrame:
+        """
+        将餐厅对象列表批量转换为 DataFrame。
+        列名映射只解析一次，按列构建；列名和列顺序与逐个调用 model_dump_with_mapping 的结果相同：
+        先是模型字段（按 餐厅对应关系 映射），再是 other_info 中的其他列（按首次出现的顺序）。
+        """
+        if not restaurants:
+            return pd.DataFrame()
+        name_mapping = get_config().BUSINESS.RESTAURANT.餐厅对应关系._config_dict
+        columns = {}
+        for field_name in Restaurant.model_fields:
+            if field_name == "other_info":
+                continue
+            excel_key = name_mapping.get(field_name) if field_name in name_mapping else field_name
+            columns[excel_key] = [getattr(restaurant, field_name) for restaurant in restaurants]
+
+        other_infos = [restaurant.other_info or {} for restaurant in restaurants]
+        other_keys = dict.fromkeys(key for other_info in other_infos for key in other_info if key not in columns)
+        for key in other_keys:
+            columns[key] = [other_info.get(key, np.nan) for other_info in other_infos]
+
+        return pd.DataFrame(columns, index=pd.RangeIndex(len(restaurants)))
     
     
-    def extract_street_base_batch(self) -> pd.DataFrame:
-        """批量生成街道候选列表"""
-        tmp = []
-        for restaurant in self.restaurants:
-            try:
-                candidate_street = self.extract_street_base(restaurant.city, restaurant.district, restaurant.chinese_address)
-                setattr(restaurant, "street", candidate_street)
-                tmp.append(restaurant)
-            except Exception as e:
-                self.logger.error(f"生成街道候选列表时出错: {str(e)}")
-        self.restaurants = tmp
-        data = [restaurant.model_dump_with_mapping() for restaurant in self.restaurants]
-        self.restaurants_df = pd.DataFrame(data)
-        # self.restaurants = self.load_from_df(self.restaurants_df)
-        self.logger.info(f"*街道候选列表生成成功。")
+    def enrich_batch(self, steps=EnrichmentPipeline.STEPS):
+        """
+        对已加载的餐厅数据执行富化流水线，街道、餐厅类型和默认值在一次遍历中完成，
+        数据按块在进程池中并行处理，结果按原顺序直接写入 restaurants_df；输入未变化的行直接复用上次的结果。
+
+        :param steps: 要执行的步骤，取值见 EnrichmentPipeline.STEPS
+        :return: (富化后的 DataFrame, 餐厅对象列表)
+        """
+        df = self.restaurants_df
+        columns = {
+            "city": _column_values(df, RESTCONF_NAME_MAP.city, ""),
+            "district": _column_values(df, RESTCONF_NAME_MAP.district, ""),
+            "chinese_name": _column_values(df, RESTCONF_NAME_MAP.chinese_name, ""),
+            "chinese_address": _column_values(df, RESTCONF_NAME_MAP.chinese_address, ""),
+            "english_name": _column_values(df, RESTCONF_NAME_MAP.english_name, None),
+            "contact_person_zh": _column_values(df, RESTCONF_NAME_MAP.contact_person_zh, ""),
+            "contact_person_en": _column_values(df, RESTCONF_NAME_MAP.contact_person_en, None),
+        }
+        results, self.enrich_errors = self.pipeline.run(columns, steps)
+        self.logger.info(f"本次重新计算 {self.pipeline.last_recomputed} 行，其余 {len(df) - self.pipeline.last_recomputed} 行复用已有结果。")
+        for error in self.enrich_errors:
+            self.logger.error(f"处理第 {error.index} 块数据（第 {error.start}-{error.stop - 1} 行）时出错: {error.message}")
+
+        self._write_columns(results)
         return self.restaurants_df, self.restaurants
 
 
-    def extract_street_base(self, city: str, district: str, address: str) -> Optional[str]:
+    def extract_street_base_batch(self) -> pd.DataFrame:
         """
-        根据城市、区域和地址从配置中匹配对应的街道。
-        
-        :param city: 城市名称（如：惠州市）
-        :param district: 区域名称（如：博罗县）
-        :param address: 完整地址字符串（如：惠州市博罗县石湾镇兴业大道东侧壹嘉广场1楼）
-        :return: 匹配到的街道名称，如果没有匹配到则返回 None
+        批量生成街道候选列表：按街道图匹配；开启 SYSTEM.street_fallback 时，
+        匹配不到的行再从地址或坐标批量解析镇/街道（默认关闭，保持离线）
         """
-        # 获取城市和区域对应的街道列表
-        streets = self._get_streets_from_config(city, district)
-
-        if not streets:
-            return None  # 如果没有配置对应的街道列表，返回 None
-        # 从地址中提取街道名
-        return self._extract_street_from_address(streets, address)
-
+        result = self.enrich_batch(steps=("street",))
+        if CONF.get("SYSTEM.street_fallback", False):
+            result = self._resolve_missing_streets()
+        self.logger.info(f"*街道候选列表生成成功。")
+        return result
 
-    def _get_streets_from_config(self, city: str, district: str) -> Optional[list]:
+    def _resolve_missing_streets(self):
         """
-        从配置文件中获取指定城市和区域的街道列表。
-        
-        :param city: 城市名称
-        :param district: 区域名称
-        :return: 对应的街道列表或 None
+        街道图中没有匹配到的行，交给 AddressService.extract_towns_batch：
+        先用正则从地址中提取镇/街道，仍然没有的按坐标去重后批量逆地理编码。
         """
-        try:
-            return CONF._config["BUSINESS"]["RESTAURANT"]["街道图"][city][district]
-        except KeyError:
-            # 如果城市或区域不存在于配置中，返回 None
-            return None
+        df = self.restaurants_df
+        streets = _column_values(df, "street", None)
+        missing = [row for row, street in enumerate(streets) if not street]
+        if not missing:
+            return self.restaurants_df, self.restaurants
+
+        addresses = _column_values(df, RESTCONF_NAME_MAP.chinese_address, None)
+        # 加载时已解析好的坐标数组，不再逐行解析 location 字符串
+        towns = AddressService().extract_towns_batch(
+            [addresses[row] for row in missing],
+            Coordinates(self.coordinates.lat[missing], self.coordinates.lon[missing]))
+        for row, town in zip(missing, towns):
+            streets[row] = town
+        self.logger.info(f"街道图未匹配的 {len(missing)} 行中，{sum(town is not None for town in towns)} 行从地址或坐标解析到镇/街道。")
+
+        self._write_columns({"street": streets})
+        return self.restaurants_df, self.restaurants
 
 
-    def _extract_street_from_address(self, streets: list, address: str) -> Optional[str]:
+    def extract_street_base(self, city: str, district: str, address: str) -> Optional[str]:
         """
-        从地址中匹配街道名。
+        根据城市、区域和地址从配置中匹配对应的街道。
         
-        :param streets: 街道名称列表
-        :param address: 完整地址字符串
-        :return: 匹配到的街道名或 None
+        :param city: 城市名称（如：惠州市）
+        :param district: 区域名称（如：博罗县）
+        :param address: 完整地址字符串（如：惠州市博罗县石湾镇兴业大道东侧壹嘉广场1楼）
+        :return: 匹配到的街道名称，如果没有配置对应的街道列表或没有匹配到则返回 None
         """
-        for street in streets:
-            if street in address:
-                return street
-        return None
+        return self.street_matcher.match(city, district, address)
 
 
     def assign_restaurant_type_base(self, name: str, address: str) -> Optional[str]:
@@ -192,43 +281,16 @@ class RestaurantService:
         根据餐厅名称或地址分配餐厅类型
         :param name: 餐厅名称
         :param address: 餐厅地址
-        :return: 匹配到的餐厅类型关键字
+        :return: 匹配到的餐厅类型关键字组（最大收油桶数最大的组，例如“酒楼/酒家/烤鱼”）
         """
-        type_mapping = CONF.get("BUSINESS.RESTAURANT.收油关系映射", {})
-        matched_types = []
-
-        for keywords, values in type_mapping.items():
-            for keyword in keywords.split("/"):
-                if keyword in name or keyword in address:
-                    # 解析配置的类型编号并获取最大值
-                    possible_values = [int(v) for v in str(values).split(",")]
-                    max_value = max(possible_values)
-                    matched_types.append((keywords, max_value))
-
-        if not matched_types:
-            return None  # 未匹配到任何类型
-
-        # 按最大值降序排序，选择最大值对应的关键字
-        matched_types.sort(key=lambda x: x[1], reverse=True)
-        return matched_types[0][0]  # 返回最大值对应的关键字组（例如“酒楼/酒家/烤鱼”）
+        return self.type_classifier.classify(name, address)
 
 
     def extract_restaurant_type_batch(self) -> pd.DataFrame:
         """批量生成餐厅类型"""
-        tmp = []
-        for restaurant in self.restaurants:
-            try:
-                restaurant_type = self.assign_restaurant_type_base(restaurant.chinese_name, restaurant.chinese_address)
-                setattr(restaurant, "restaurant_type", restaurant_type)
-                tmp.append(restaurant)
-            except Exception as e:
-                self.logger.error(f"生成餐厅类型时出错: {str(e)}")
-        self.restaurants = tmp
-        data = [restaurant.model_dump_with_mapping() for restaurant in self.restaurants]
-        self.restaurants_df = pd.DataFrame(data)
-        self.restaurants = self.load_from_df(self.restaurants_df)
+        result = self.enrich_batch(steps=("type",))
         self.logger.info(f"*餐厅类型生成成功。")
-        return self.restaurants_df, self.restaurants
+        return result
 
 
 if __name__ == "__main__":
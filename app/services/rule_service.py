@@ -63,62 +63,104 @@ class RuleService:
     分配车辆号码
     传入餐厅信息和车辆信息，根据收油数分配车辆号码，并将结果与原DataFrame合并
     """
+    @staticmethod
     def oil_assign_vehicle_numbers(df_restaurants: pd.DataFrame, df_vehicles: pd.DataFrame) -> pd.DataFrame:
         """
-        根据收油数分配车辆号码，并将结果与原DataFrame合并
-        
+        根据收油数分配车辆号码：每个区域内按行顺序累加收油数，累计值达到 35-44 桶时装满一车；
+        累计值越过 44 之后该区域剩余的餐厅全部装入同一车，区域末尾不足 35 桶的餐厅不分配车辆；
+        收油数为空的餐厅及该区域其后的餐厅不分配车辆（切分规则见 _pack_loads）。
+        车牌号打乱后按装车顺序循环使用。
+
         :param df_restaurants: 包含'镇/街道', '区域', '餐厅类型', '收油数'的DataFrame
         :param df_vehicles: 包含'车牌号'的DataFrame
-        :return: 处理后的DataFrame
+        :return: 每个餐厅一行，增加'车牌号', '累计收油数'两列（未分配的为空）
+        """
+        vehicle_numbers = df_vehicles['车牌号'].sample(frac=1, replace=False).to_numpy()  # 乱序车牌号
+        amounts = df_restaurants['收油数'].to_numpy(dtype=float)
+
+        # 每个餐厅所在的车次（全局编号，-1 表示未分配）和该车的累计收油数
+        truck_ids = np.full(len(amounts), -1)
+        loads = np.full(len(amounts), np.nan)
+
+        # 按区域排序分组（与 groupby('区域') 的顺序一致），区域内保持原顺序
+        codes, _ = pd.factorize(df_restaurants['区域'], sort=True)
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if len(order) else []
+        ends = np.r_[starts[1:], len(order)] if len(order) else []
+        n_trucks = 0
+        for start, end in zip(starts, ends):
+            if sorted_codes[start] < 0:
+                continue  # 区域为空的餐厅不分配
+            rows = order[start:end]
+            cumulative = np.cumsum(amounts[rows])
+            load_ends = RuleService._pack_loads(cumulative)
+            if not len(load_ends):
+                continue
+            # 每行所属的车次：第一个结束位置 >= 行号的那一车，最后一车之后的行不分配
+            segment = np.searchsorted(load_ends, np.arange(len(rows)), side="left")
+            packed = segment < len(load_ends)
+            load_totals = np.diff(np.r_[0.0, cumulative[load_ends]])
+            truck_ids[rows[packed]] = n_trucks + segment[packed]
+            loads[rows[packed]] = load_totals[segment[packed]]
+            n_trucks += len(load_ends)
+
+        assigned = truck_ids >= 0
+        if assigned.any() and not len(vehicle_numbers):
+            raise ValueError("车辆信息中没有车牌号")
+        plates = np.full(len(amounts), np.nan, dtype=object)
+        if assigned.any():
+            plates[assigned] = vehicle_numbers[truck_ids[assigned] % len(vehicle_numbers)]
+
+        result_df = df_restaurants.reset_index(drop=True)
+        result_df['车牌号'] = plates
+        result_df['累计收油数'] = loads
+        return result_df
+
+    @staticmethod
+    def _pack_loads(cumulative: np.ndarray, low: float = 35, high: float = 44) -> np.ndarray:
         """
-        # 初始化一些变量
-        vehicle_numbers = df_vehicles['车牌号'].sample(frac=1, replace=False).tolist() #乱序车牌号
-        result_rows = []
-        current_vehicle_index = 0
-        
-        # 按区域分组
-        grouped = df_restaurants.groupby('区域')
-        
-        for area, group in grouped:
-            accumulated_sum = 0
-            temp_group = []
-            
-            for index, row in group.iterrows():
-                temp_group.append(row)
-                accumulated_sum += row['收油数']
-                
-                # 如果累计值在35-44之间，则分配车牌号并重置累计值
-                if 35 <= accumulated_sum <= 44:
-                    for temp_row in temp_group:
-                        temp_row = temp_row.copy()  # 防止修改原DataFrame
-                        temp_row['车牌号'] = vehicle_numbers[current_vehicle_index]
-                        temp_row['累计收油数'] = accumulated_sum
-                        result_rows.append(temp_row)
-                    current_vehicle_index = (current_vehicle_index + 1) % len(vehicle_numbers)
-                    accumulated_sum = 0
-                    temp_group = []
-            
-            # 清理未达标的数据
-            if accumulated_sum < 35 and temp_group:
-                continue  # 跳过最后未达标的记录
-            
-            # 如果有剩余但大于等于35，则分配最后一个车牌号
-            if accumulated_sum >= 35:
-                for temp_row in temp_group:
-                    temp_row = temp_row.copy()  # 防止修改原DataFrame
-                    temp_row['车牌号'] = vehicle_numbers[current_vehicle_index]
-                    temp_row['累计收油数'] = accumulated_sum
-                    result_rows.append(temp_row)
-                current_vehicle_index = (current_vehicle_index + 1) % len(vehicle_numbers)
-        
-        # 返回新的DataFrame
-        result_df = pd.DataFrame(result_rows)
-        
-        # 将结果与原DataFrame进行左连接，确保所有原始数据都在结果中
-        merged_df = pd.merge(df_restaurants, result_df[['镇/街道', '区域', '车牌号', '累计收油数']], 
-                            on=['镇/街道', '区域'], how='left')
-        
-        return merged_df
+        在一个区域的累计收油数上切分车次，规则与逐行累加相同：
+        本车累计值第一次落在 [low, high] 内时装满一车；之后再也落不到区间内时，
+        剩余的餐厅在累计值 >= low 时装入最后一车，否则不装车。
+        收油数为空时累计值从该行起为空，之后不再装车。
+
+        :param cumulative: 区域内收油数的累加值
+        :param low: 一车的最少桶数
+        :param high: 一车的最多桶数
+        :return: 每一车最后一个餐厅在区域内的位置
+        """
+        load_ends = []
+        base = 0.0
+        n = len(cumulative)
+        if n and not np.isnan(cumulative).any() and (np.diff(cumulative) >= 0).all() and cumulative[0] >= 0:
+            # 收油数非负时累计值非递减，用二分查找定位每一车
+            while True:
+                # 第一个使本车累计值 >= low 的位置
+                position = int(np.searchsorted(cumulative, base + low, side="left"))
+                if position >= n:
+                    break  # 剩余不足 low，不装车
+                if cumulative[position] - base > high:
+                    # 越过了上限，之后不会再落回区间内，剩余的全部装入这一车
+                    load_ends.append(n - 1)
+                    break
+                load_ends.append(position)
+                base = cumulative[position]
+            return np.array(load_ends, dtype=int)
+
+        # 含负数或空值时累计值可能回落，逐车在剩余部分中查找第一个落在区间内的位置
+        start = 0
+        while start < n:
+            loads = cumulative[start:] - base
+            hits = np.flatnonzero((loads >= low) & (loads <= high))
+            if not len(hits):
+                if loads[-1] >= low:
+                    load_ends.append(n - 1)
+                break
+            load_ends.append(start + int(hits[0]))
+            base = cumulative[load_ends[-1]]
+            start = load_ends[-1] + 1
+        return np.array(load_ends, dtype=int)
 
     """
     写入Excel文件，并合并分配的车牌号和对应的累加收油数单元格
@@ -208,6 +250,41 @@ class RuleService:
         new_df['交付日期'] = delivery_dates[:len(new_df)]
         
         return new_df
+
+    @staticmethod
+    def _daily_processing(dates: pd.Series, weights: pd.Series):
+        """
+        按日期计算加工量和毛油库存（同一日期的行可以不连续）：
+        每个日期的最后一行加工量为该日期榜单净重之和，其余行为 0；
+        毛油库存为同一日期内榜单净重的逐行累加值减去加工量。日期为空的行两者都为 0。
+
+        :param dates: 日期列
+        :param weights: 榜单净重列
+        :return: (加工量, 毛油库存)，均为与输入等长的 float 数组
+        """
+        codes, _ = pd.factorize(dates)
+        values = weights.to_numpy(dtype=float)
+        processing = np.zeros(len(values))
+        inventory = np.zeros(len(values))
+        if not len(values):
+            return processing, inventory
+
+        # 稳定排序后同一日期的行相邻且保持原顺序，每个日期只做一次切片运算
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        for start, end in zip(starts, ends):
+            if sorted_codes[start] < 0:
+                continue
+            rows = order[start:end]
+            running = np.cumsum(values[rows])
+            total = np.nansum(values[rows])
+            running[-1] -= total
+            processing[rows[-1]] = total
+            inventory[rows] = running
+        return processing, inventory
+
     """
     总表：生成毛油库存 期末库存、辅助列、转化系数、产出重量、售出数量、加工量
     传入平衡表_5月表
@@ -231,46 +308,20 @@ class RuleService:
         # 步骤1：新建一个dataframe,从dataframe复制日期、车牌号、榜单净重、榜单编号、收集城市
         new_df = df[['日期', '车牌号', '榜单净重', '榜单编号', '收集城市']].copy()
         
-        # 初始化新增的列
-        new_df['加工量'] = 0.0
-        new_df['毛油库存'] = 0.0
-        new_df['辅助列'] = None
-        new_df['转化系数'] = [np.random.randint(900, 931) for _ in range(len(new_df))]
-        new_df['产出重量'] = round(new_df['加工量'] * new_df['转化系数'] / 100, 2)
-        new_df['售出数量'] = 0
-        new_df['期末库存'] = 0.0
-        
         # 步骤2：计算加工量和毛油库存
-        for date in new_df['日期'].unique():
-            mask = new_df['日期'] == date
-            if mask.sum() > 0:  # 确保有数据
-                total_weight = new_df.loc[mask, '榜单净重'].sum()
-                last_index = new_df[mask].index[-1]
-                new_df.at[last_index, '加工量'] = total_weight
-                
-                # 更新毛油库存
-                running_total = 0.0
-                for idx in new_df[mask].index:
-                    current_weight = new_df.at[idx, '榜单净重']
-                    previous_inventory = running_total if idx != new_df[mask].index[0] else 0
-                    processing_amount = new_df.at[idx, '加工量']
-                    new_df.at[idx, '毛油库存'] = current_weight + previous_inventory - processing_amount
-                    running_total = new_df.at[idx, '毛油库存']
-                    
-        # 计算产出重量
-        new_df['产出重量'] = round(new_df['加工量'] * new_df['转化系数'] / 100, 2)
-        
-        # 计算辅助列
+        new_df['加工量'], new_df['毛油库存'] = self._daily_processing(new_df['日期'], new_df['榜单净重'])
+
+        # 计算辅助列：日期的最后一行为 1，其余为空
         new_df['辅助列'] = new_df['日期'].ne(new_df['日期'].shift(-1)).astype(int)
         new_df['辅助列'] = new_df['辅助列'].replace({1: 1, 0: None})
-        
-        # 计算期末库存
-        previous_end_stock = 0.0 #第一行的期末库存前一行默认0
-        for index, row in new_df.iterrows():
-            current_output = row['产出重量']
-            current_sale = row['售出数量']
-            new_df.at[index, '期末库存'] = current_output + previous_end_stock - current_sale
-            previous_end_stock = new_df.at[index, '期末库存']
+
+        # 计算产出重量
+        new_df['转化系数'] = np.random.randint(900, 931, size=len(new_df))
+        new_df['产出重量'] = round(new_df['加工量'] * new_df['转化系数'] / 100, 2)
+        new_df['售出数量'] = 0
+
+        # 计算期末库存：期末库存 = 产出重量 + 上一行期末库存 - 售出数量，第一行的上一行默认 0
+        new_df['期末库存'] = np.cumsum((new_df['产出重量'] - new_df['售出数量']).to_numpy(dtype=float))
 
         # 如果提供了总表，则合并数据
         if total_df is not None:
@@ -282,77 +333,101 @@ class RuleService:
     """
     收货确认书，传入五月平衡表和车辆信息
     """
+    @staticmethod
     def generate_df_check(df_balance: pd.DataFrame, df_car: pd.DataFrame) -> pd.DataFrame:
-    # 步骤1：新建一个dataframe名为df_check，包含提货日期、名称、车牌号、重量、司机、磅单号、毛重、皮重、净重、卸货重量
-        df_check = pd.DataFrame(columns=['提货日期', '名称', '车牌号', '重量', '司机', '磅单号', '毛重', '皮重', '净重', '卸货重量'])
-        
+        # 步骤1：新建一个dataframe名为df_check，包含提货日期、名称、车牌号、重量、司机、磅单号、毛重、皮重、净重、卸货重量
+        df_check = pd.DataFrame(columns=['提货日期', '名称', '车牌号', '重量', '司机', '磅单号', '毛重', '皮重', '净重', '卸货重量'],
+                                index=pd.RangeIndex(len(df_balance)))
+        n = len(df_check)
+
         # 步骤2：复制输入的dataframe中的磅单编号作为df_check的磅单号
-        df_check['磅单号'] = df_balance['磅单编号']
-        
-        # 步骤3：df_check的重量列值=RANDBETWEEN(3050,3495)/100，保证所有行的重量和在3000的上下5%范围内，否则的话重新赋值重量列为RANDBETWEEN(3050,3495)/100
-        total_weight_target = 3000
-        tolerance = 0.05
-        while True:
-            df_check['重量'] = [np.random.randint(3050, 3496) / 100 for _ in range(len(df_check))]
-            total_weight = df_check['重量'].sum()
-            if (1 - tolerance) * total_weight_target <= total_weight <= (1 + tolerance) * total_weight_target:
-                break
-        
+        df_check['磅单号'] = df_balance['磅单编号'].to_numpy()
+
+        # 步骤3：df_check的重量列值=RANDBETWEEN(3050,3495)/100，保证所有行的重量和在3000的上下5%范围内
+        df_check['重量'] = RuleService._sample_check_weights(n) / 100
+
         # 步骤4：确定输入的dataframe的日期列一共有多少天，用92除以天数为每一天的车次car_number_of_day，
         # df_check的提货日期列的从df_oil的第一天+1开始，每个日期循环car_number_of_day加减1次做为提货日期值；
-            days = len(df_balance['日期'].unique())
-            car_number_of_day = 92 // days
-            start_date = pd.to_datetime(df_balance['日期'].min()) + pd.Timedelta(days=1)
-            dates = []
-            current_date = start_date
-            for day in range(days):
-                date = current_date
-                for _ in range(car_number_of_day + np.random.choice([-1, 0, 1])): #循环
-                    dates.append(date)
-                current_date += pd.Timedelta(days=1)
-            
-            # 确保dates列表长度与df_check行数相同
-            if len(dates) < len(df_check):
-                additional_days_needed = len(df_check) - len(dates)
-                last_date = dates[-1]
-                for i in range(additional_days_needed):
-                    dates.append(last_date + pd.Timedelta(days=i + 1))
-            elif len(dates) > len(df_check):
-                dates = dates[:len(df_check)]
-            
-            df_check['提货日期'] = dates
-        
+        days = len(df_balance['日期'].unique())
+        car_number_of_day = 92 // days
+        start_date = pd.to_datetime(df_balance['日期'].min()) + pd.Timedelta(days=1)
+        day_dates = start_date + pd.to_timedelta(np.arange(days), unit='D')
+        cars_per_day = np.clip(car_number_of_day + np.random.choice([-1, 0, 1], size=days), 0, None)
+        dates = day_dates.repeat(cars_per_day)
+
+        # 确保dates长度与df_check行数相同：不足的从最后一天起逐日顺延，多余的截掉
+        if len(dates) < n:
+            last_date = dates[-1] if len(dates) else start_date - pd.Timedelta(days=1)
+            dates = dates.append(last_date + pd.to_timedelta(np.arange(1, n - len(dates) + 1), unit='D'))
+        df_check['提货日期'] = dates[:n]
+
         # 步骤5：先对df_car按照车牌号随机打乱行顺序，
-        df_car_shuffled = df_car.sample(frac=1).reset_index(drop=True)
-        
         # df_check的车牌号列的值循环从打乱后df_car的车牌号列取值，
         # df_check的司机列的值对应df_car表相同行的`司机`列的值，
         # df_check的皮重列=df_car表的皮重+RANDBETWEEN(1,13)*10
-        for i in range(len(df_check)):
-            car_idx = i % len(df_car_shuffled)
-            df_check.at[i, '车牌号'] = df_car_shuffled.loc[car_idx, '车牌号']
-            df_check.at[i, '司机'] = df_car_shuffled.loc[car_idx, '司机']
-            df_check.at[i, '皮重'] = df_car_shuffled.loc[car_idx, '皮重'] + np.random.randint(1, 14) * 10
-        
+        df_car_shuffled = df_car.sample(frac=1).reset_index(drop=True)
+        car_idx = np.arange(n) % len(df_car_shuffled)
+        df_check['车牌号'] = df_car_shuffled['车牌号'].to_numpy()[car_idx]
+        df_check['司机'] = df_car_shuffled['司机'].to_numpy()[car_idx]
+        df_check['皮重'] = df_car_shuffled['皮重'].to_numpy()[car_idx] + np.random.randint(1, 14, size=n) * 10
+
         # 步骤6：df_check的净重列=重量*1000，df_check的毛重列=皮重+净重；
         df_check['净重'] = df_check['重量'] * 1000
         df_check['毛重'] = df_check['皮重'] + df_check['净重']
-        
+
         # df_check的差值列=LOOKUP(RANDBETWEEN(1,1000),{0,3,6,10,15,30,60,90,150,200,300,350,480,550,700,800,850,900,940,970,990,995,1001},{-15,-14,-13,-12,-11,-7,-6,-5,-4,-3,-2,-1,0,1,2,3,4,5,6,7,11,12})/100
         lookup_values = np.array([0, 3, 6, 10, 15, 30, 60, 90, 150, 200, 300, 350, 480, 550, 700, 800, 850, 900, 940, 970, 990, 995, 1001])
         lookup_results = np.array([-15, -14, -13, -12, -11, -7, -6, -5, -4, -3, -2, -1, 0, 1, 2, 3, 4, 5, 6, 7, 11, 12])
-        random_lookup = np.random.randint(1, 1002, size=len(df_check))
-        df_check['差值'] = np.interp(random_lookup, lookup_values, lookup_results) / 100
-        
+        random_lookup = np.random.randint(1, 1001, size=len(df_check))
+        # LOOKUP 取不大于查找值的最大区间端点对应的结果
+        df_check['差值'] = lookup_results[np.searchsorted(lookup_values, random_lookup, side='right') - 1] / 100
+
         # 步骤7：df_check卸货重量=重量+差值
         df_check['卸货重量'] = df_check['重量'] + df_check['差值']
-        
+
         return df_check
+
+    @staticmethod
+    def _sample_check_weights(n: int, low: int = 3050, high: int = 3495,
+                              target: int = 3000, tolerance: float = 0.05) -> np.ndarray:
+        """
+        一次生成 n 车的重量（单位：0.01 吨），每车在 [low, high] 之间，总和在 target 吨的上下 tolerance 范围内。
+        先独立均匀抽样；总和落在范围外时，在范围内随机取一个目标总和，
+        按各车到上限（或下限）的余量比例把差额分摊到各车，分摊后仍在 [low, high] 之内。
+
+        :param n: 车数
+        :return: 整数数组，除以 100 即为吨数
+        :raises ValueError: n 车无论如何取值都达不到目标范围
+        """
+        band_low = int(np.ceil(target * (1 - tolerance) * 100))
+        band_high = int(np.floor(target * (1 + tolerance) * 100))
+        feasible_low, feasible_high = max(band_low, n * low), min(band_high, n * high)
+        if feasible_low > feasible_high:
+            raise ValueError(
+                f"{n} 车无法满足总重量 {target}±{tolerance:.0%} 吨：每车重量需在 {low / 100:.2f}-{high / 100:.2f} 吨之间，"
+                f"车数应在 {int(np.ceil(band_low / high))}-{band_high // low} 之间")
+
+        weights = np.random.randint(low, high + 1, size=n)
+        total = int(weights.sum())
+        if feasible_low <= total <= feasible_high:
+            return weights
+
+        goal = int(np.random.randint(feasible_low, feasible_high + 1))
+        difference = goal - total
+        room = (high - weights) if difference > 0 else (weights - low)
+        # 按余量比例分摊，取整后的余数分给小数部分最大的几车
+        share = abs(difference) * room / room.sum()
+        adjust = np.floor(share).astype(int)
+        remainder = abs(difference) - int(adjust.sum())
+        if remainder:
+            adjust[np.argsort(adjust - share, kind="stable")[:remainder]] += 1
+        return weights + np.sign(difference) * adjust
     
     """
     复制收货确认书的“数据透视表”的每日重量一列至物料平衡表-总表，对齐日期
     传入收货确认书和平衡表-总表
     """
+    @staticmethod
     def process_check_to_sum(df_generate_check: pd.DataFrame, df_generate_sum: pd.DataFrame) -> pd.DataFrame:
         """
         处理两个DataFrame并生成一个新的DataFrame。
@@ -362,22 +437,27 @@ class RuleService:
         :return: 处理后的DataFrame
         """
         # 步骤1：对df_generate_check表根据提货日期对重量进行求和汇总得到df_sum
-        df_sum = df_generate_check.groupby('提货日期')['重量'].sum().reset_index()
-        df_sum.rename(columns={'重量': '汇总重量'}, inplace=True)
-        
-        # 步骤2：关联df_generate_sum和df_sum，根据df_generate_sum的供应日期和df_sum的提货日期，
-        # 将df_generate_sum中相同日期的最后一行的售出数量赋值为df_sum对应日期的汇总值
-        df_merged = pd.merge(df_generate_sum, df_sum, left_on='供应日期', right_on='提货日期', how='left')
-        
-        # 对于每个日期，找到最后一行并将售出数量设置为汇总重量
-        for date in df_merged['供应日期'].unique():
-            mask = df_merged['供应日期'] == date
-            if mask.sum() > 0:  # 确保有数据
-                last_index = df_merged[mask].index[-1]  # 获取相同日期中的最后一行索引
-                df_merged.at[last_index, '售出数量'] = df_merged.loc[last_index, '汇总重量']
-        
-        # 删除不必要的列
-        df_final = df_merged.drop(columns=['提货日期', '汇总重量'])
+        df_sum = df_generate_check.groupby('提货日期')['重量'].sum()
+        
+        # 步骤2：根据df_generate_sum的供应日期和df_sum的提货日期，
+        # 将df_generate_sum中相同日期的最后一行的售出数量赋值为df_sum对应日期的汇总值；收货确认书中没有的日期保持不变
+        df_final = df_generate_sum.reset_index(drop=True)
+        if df_sum.empty:
+            return df_final
+        if pd.api.types.is_integer_dtype(df_final['售出数量']):
+            df_final['售出数量'] = df_final['售出数量'].astype(float)
+
+        # 总表按日期排序时（多年的总表通常如此）只需处理收货确认书日期范围内的一段
+        supply_dates = df_final['供应日期']
+        if supply_dates.is_monotonic_increasing:
+            start = supply_dates.searchsorted(df_sum.index.min(), side='left')
+            end = supply_dates.searchsorted(df_sum.index.max(), side='right')
+            supply_dates = supply_dates.iloc[start:end]
+
+        # 每个日期的最后一行
+        last_rows = ~supply_dates.duplicated(keep='last') & supply_dates.isin(df_sum.index)
+        stamped = supply_dates[last_rows]
+        df_final.loc[stamped.index, '售出数量'] = stamped.map(df_sum).to_numpy()
         
         return df_final
     
@@ -404,6 +484,7 @@ class RuleService:
     平衡表-总表合同编号分配
     输入平衡表总表、收货确认书、当日生产转化系数、生成平衡表等的日期
     """
+    @staticmethod
     def process_balance_sum_contract(df_generate_sum: pd.DataFrame, df_generate_check: pd.DataFrame,
                        df_generate_balance_last_month: pd.DataFrame, df_generate_balance_current_month: pd.DataFrame,
                        coeff_number: float, current_date: str):
@@ -416,64 +497,68 @@ class RuleService:
         :param current_date: 字符串格式的当前日期
         :return: 处理后的DataFrame
         """
+        # 供应日期所在月份只计算一次，后续各步骤共用
+        supply_dates = df_generate_sum['供应日期']
+        periods = supply_dates.dt.to_period('M')
+        output = df_generate_sum['产出重量']
+
         # 步骤1：sum_product=df_generate_check的重量列进的和
         sum_product = df_generate_check['重量'].sum()
         
         # 步骤2：last_month=current_date上一个月；
         current_date = pd.to_datetime(current_date)
         last_month = (current_date - timedelta(days=current_date.day)).replace(day=1)
-        last_month_ending_inventory = df_generate_sum[df_generate_sum['供应日期'].dt.to_period('M') == last_month.to_period('M')].iloc[-1]['期末库存']
+        mask_last_month = (periods == last_month.to_period('M')).to_numpy()
+        last_month_ending_inventory = df_generate_sum.loc[mask_last_month, '期末库存'].iloc[-1]
         
         # 步骤3：当月的产出重量month_quantity = sum_product-last_month_ending_inventory 
         month_quantity = sum_product - last_month_ending_inventory
         
         # 步骤4：取出df_generate_sum表中供应日期的月份等于current_date月份并且产出重量不为空值或者null值的供应日期和产出重量值，并去重，
-        # 循环去重后的供应日期和产出重量值，对产出重量值进行累加求和，当加到某一行的产出重量累加值<=month_quantity 并且下一行的产出重量累加值>month_quantity 时停止，
-        # 记录当前行的供应日期stop_date和累加值sum_quantity；
-        mask_current_month = (df_generate_sum['供应日期'].dt.to_period('M') == current_date.to_period('M')) & (df_generate_sum['产出重量'].notna())
-        filtered_df = df_generate_sum[mask_current_month][['供应日期', '产出重量']].drop_duplicates()
-        
-        cumulative_sum = 0
-        stop_date = None
-        sum_quantity = 0
-        for index, row in filtered_df.iterrows():
-            cumulative_sum += row['产出重量']
-            if cumulative_sum > month_quantity:
-                stop_date = row['供应日期']
-                sum_quantity = cumulative_sum - row['产出重量']
-                break
-            else:
-                stop_date = filtered_df.iloc[-1]['供应日期']
-                sum_quantity = cumulative_sum
+        # 对产出重量值进行累加求和，当加到某一行的产出重量累加值<=month_quantity 并且下一行的产出重量累加值>month_quantity 时停止，
+        # 记录下一行的供应日期stop_date和当前行的累加值sum_quantity；累加值始终不超过month_quantity时取最后一行
+        mask_current_month = (periods == current_date.to_period('M')).to_numpy()
+        filtered_df = df_generate_sum.loc[mask_current_month & output.notna().to_numpy(), ['供应日期', '产出重量']].drop_duplicates()
+        if filtered_df.empty:
+            raise ValueError(f"平衡表总表中没有 {current_date:%Y-%m} 的产出重量")
+
+        quantities = filtered_df['产出重量'].to_numpy(dtype=float)
+        cumulative = np.cumsum(quantities)
+        # 产出重量非负，累加值非递减：第一个累加值 > month_quantity 的位置
+        position = int(np.searchsorted(cumulative, month_quantity, side='right'))
+        if position < len(cumulative):
+            stop_date = filtered_df['供应日期'].iloc[position]
+            sum_quantity = cumulative[position] - quantities[position]
+        else:
+            stop_date = filtered_df['供应日期'].iloc[-1]
+            sum_quantity = cumulative[-1]
         
         # 步骤5：求出剩余的原料remaining_materia= （month_quantity  -sum_quantity）/coeff_number,
         remaining_material = (month_quantity - sum_quantity) / coeff_number
         
         # 依次对df_generate_sum中供应日期大于stop_date的行的每车吨量累加求和，直到累加和>remaining_materia停止，记录对应的行索引stop_index
-        mask_after_stop_date = (df_generate_sum['供应日期'] >= stop_date) #大于等于，因为stop_date上面是已经大于剩余量的日期
-        cumulative_weight = 0
-        stop_index = None
-        for idx, row in df_generate_sum[mask_after_stop_date].iterrows():
-            cumulative_weight += row['产出重量']
-            if cumulative_weight > remaining_material:
-                stop_index = idx
-                break
+        # 大于等于，因为stop_date上面是已经大于剩余量的日期；总表按日期排序时直接定位到stop_date所在行
+        if supply_dates.is_monotonic_increasing:
+            rows_after_stop = np.arange(supply_dates.searchsorted(stop_date, side='left'), len(df_generate_sum))
+        else:
+            rows_after_stop = np.flatnonzero((supply_dates >= stop_date).to_numpy())
+        exceeded = np.cumsum(output.to_numpy(dtype=float)[rows_after_stop]) > remaining_material
+        stop_index = df_generate_sum.index[rows_after_stop[exceeded.argmax()]] if exceeded.any() else None
         
         # 步骤6：填充df_generate_sum表中分配明细列，
         # 填充规则为1：供应日期的月份=current_date减1个月的合同分配明细列为空的分配明细列；
-        # 2：供应日期的月份=current_date对应月份行索引<=stop_index的分配明细列。
+        # 2：供应日期的月份=current_date对应月份行索引<=stop_index的分配明细列（累加和始终未超过剩余量时不填充）。
         # 填充值为BWD-JC开头，加current_date年份的后2位数字，加current_date月份的第一天，
         # 例如current_date='2024-05-06'，则填充值为BWD-JC240501
         fill_value = f"BWD-JC{str(current_date.year)[-2:]}{current_date.month:02d}01"
+        unassigned = df_generate_sum['分配明细'].isna().to_numpy()
         
         # 规则1
-        mask_last_month = df_generate_sum['供应日期'].dt.to_period('M') == last_month.to_period('M')
-        df_generate_sum.loc[mask_last_month & df_generate_sum['分配明细'].isna(), '分配明细'] = fill_value
+        df_generate_sum.loc[mask_last_month & unassigned, '分配明细'] = fill_value
         
         # 规则2
-        mask_current_month = df_generate_sum['供应日期'].dt.to_period('M') == current_date.to_period('M')
-        mask_until_stop_index = df_generate_sum.index <= stop_index
-        df_generate_sum.loc[mask_current_month & mask_until_stop_index & df_generate_sum['分配明细'].isna(), '分配明细'] = fill_value
+        mask_until_stop_index = df_generate_sum.index <= stop_index if stop_index is not None else False
+        df_generate_sum.loc[mask_current_month & mask_until_stop_index & unassigned, '分配明细'] = fill_value
         # 步骤7：填充df_generate_balance_last_month表中合同分配明细列为空的分配明细列，值为BWD-JC开头，加current_date年份的后2位数字，加current_date月份的第一天；
         df_generate_balance_last_month.loc[df_generate_balance_last_month['分配明细'].isna(), '分配明细'] = fill_value
         
@@ -481,7 +566,7 @@ class RuleService:
         # 填充值为BWD-JC开头，加current_date年份的后2位数字，加current_date月份的第一天
         # 假设关联字段是'供应日期' 和 '过磅单编号'
         df_generate_balance_current_month = df_generate_balance_current_month.merge(
-            df_generate_sum[['供应日期', '分配明细']], left_on=['供应日期', '过磅单编号'], right_on=['供应日期', '过磅单编号'], how='left')
+            df_generate_sum[['供应日期', '过磅单编号', '分配明细']], on=['供应日期', '过磅单编号'], how='left')
         df_generate_balance_current_month['分配明细_x'] = df_generate_balance_current_month['分配明细_y'].fillna(fill_value)
         df_generate_balance_current_month.drop(columns=['分配明细_y'], inplace=True)
         df_generate_balance_current_month.rename(columns={'分配明细_x': '分配明细'}, inplace=True)
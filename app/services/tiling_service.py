@@ -0,0 +1,202 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from app.config import CONF
+from app.utils.logger import setup_logger
+from app.services.fetch_service import get_rate_limiter, response_cache
+from app.services.http_service import http_transport
+from app.services.map_api_service import RestaurantInfo
+
+
+class Cell(NamedTuple):
+    """经纬度矩形网格，depth 为细分的层数"""
+    min_lon: float
+    min_lat: float
+    max_lon: float
+    max_lat: float
+    depth: int = 0
+
+    def split(self) -> List["Cell"]:
+        """四等分"""
+        mid_lon = (self.min_lon + self.max_lon) / 2
+        mid_lat = (self.min_lat + self.max_lat) / 2
+        depth = self.depth + 1
+        return [
+            Cell(self.min_lon, self.min_lat, mid_lon, mid_lat, depth),
+            Cell(mid_lon, self.min_lat, self.max_lon, mid_lat, depth),
+            Cell(self.min_lon, mid_lat, mid_lon, self.max_lat, depth),
+            Cell(mid_lon, mid_lat, self.max_lon, self.max_lat, depth),
+        ]
+
+
+class CellResult(NamedTuple):
+    """单个网格的查询结果：原始 POI，或者需要继续细分的子网格"""
+    pois: List[dict]
+    children: List[Cell]
+
+
+# 各服务商的矩形检索接口
+GAODE_POLYGON_URL = "https://restapi.amap.com/v3/place/polygon"
+BAIDU_SEARCH_URL = "https://api.map.baidu.com/place/v2/search"
+GAODE_DISTRICT_URL = "https://restapi.amap.com/v3/config/district"
+
+# 服务商能翻页取到的结果上限（默认值），网格结果数达到上限时细分
+DEFAULT_CAPS = {"gaode": 200, "baidu": 150}
+
+
+class TileCrawler:
+    """
+    自适应网格抓取：把城市范围切成网格，逐格用矩形检索（高德 place/polygon、百度 bounds）查询；
+    某个网格的结果总数达到服务商的翻页上限时，把它四等分后递归查询，直到不再触顶或达到最大层数。
+    同一层的网格并发查询（受服务商限流器约束），结果按 POI id 去重后合并。
+    """
+
+    PAGE_SIZE = 20
+
+    def __init__(self, provider: str, token: str, keywords: str, poi_type: str = "",
+                 cap: Optional[int] = None, max_depth: Optional[int] = None, concurrency: Optional[int] = None):
+        """
+        :param provider: gaode 或 baidu
+        :param token: api key
+        :param keywords: 检索关键字
+        :param poi_type: POI 类型（高德 types / 百度 tag）
+        :param cap: 单个网格可取到的结果上限，默认读取 SYSTEM.map_tiling.<provider>.cap
+        :param max_depth: 最多细分层数，默认读取 SYSTEM.map_tiling.max_depth
+        :param concurrency: 并发查询的网格数，默认读取 SYSTEM.map_fetch_concurrency
+        """
+        if provider not in DEFAULT_CAPS:
+            raise ValueError(f"网格抓取不支持的服务商：{provider}")
+        self.provider = provider
+        self.token = token
+        self.keywords = keywords
+        self.poi_type = poi_type
+        self.cap = cap or CONF.get(f"SYSTEM.map_tiling.{provider}.cap", DEFAULT_CAPS[provider])
+        self.max_depth = CONF.get("SYSTEM.map_tiling.max_depth", 6) if max_depth is None else max_depth
+        self.concurrency = concurrency or CONF.get("SYSTEM.map_fetch_concurrency", 4)
+        self.limiter = get_rate_limiter(provider)
+        self.logger = setup_logger("moco.log")
+
+    @staticmethod
+    def grid(bbox: Tuple[float, float, float, float], cell_km: float) -> List[Cell]:
+        """
+        把范围切成边长约 cell_km 公里的初始网格。
+
+        :param bbox: (最小经度, 最小纬度, 最大经度, 最大纬度)
+        """
+        min_lon, min_lat, max_lon, max_lat = bbox
+        lat_step = cell_km / 111.0
+        lon_step = cell_km / (111.0 * max(math.cos(math.radians((min_lat + max_lat) / 2)), 0.01))
+        n_lon = max(1, math.ceil((max_lon - min_lon) / lon_step))
+        n_lat = max(1, math.ceil((max_lat - min_lat) / lat_step))
+        d_lon = (max_lon - min_lon) / n_lon
+        d_lat = (max_lat - min_lat) / n_lat
+        return [
+            Cell(min_lon + i * d_lon, min_lat + j * d_lat, min_lon + (i + 1) * d_lon, min_lat + (j + 1) * d_lat)
+            for j in range(n_lat) for i in range(n_lon)
+        ]
+
+    @staticmethod
+    def city_bbox(city: str, gaode_key: str) -> Tuple[float, float, float, float]:
+        """
+        用高德行政区查询取得城市边界的外接矩形（GCJ-02）。
+
+        :return: (最小经度, 最小纬度, 最大经度, 最大纬度)
+        """
+        data = http_transport.get_json("gaode", GAODE_DISTRICT_URL, params={
+            "keywords": city, "subdistrict": 0, "extensions": "all", "key": gaode_key})
+        districts = data.get("districts") or []
+        polyline = districts[0].get("polyline") if districts else None
+        if not polyline:
+            raise ValueError(f"未查询到 {city} 的行政区边界")
+        points = [tuple(map(float, point.split(","))) for ring in polyline.split("|") for point in ring.split(";")]
+        lons = [point[0] for point in points]
+        lats = [point[1] for point in points]
+        return min(lons), min(lats), max(lons), max(lats)
+
+    def crawl(self, bbox: Tuple[float, float, float, float], cell_km: Optional[float] = None) -> List[dict]:
+        """
+        抓取范围内的全部 POI。
+
+        :param bbox: (最小经度, 最小纬度, 最大经度, 最大纬度)，坐标系与服务商一致
+        :param cell_km: 初始网格边长，默认读取 SYSTEM.map_tiling.cell_km
+        :return: 与 RestaurantInfo 相同格式的餐厅记录
+        """
+        cells = self.grid(bbox, cell_km or CONF.get("SYSTEM.map_tiling.cell_km", 10))
+        pois: Dict[str, dict] = {}
+        with ThreadPoolExecutor(max_workers=max(int(self.concurrency), 1)) as executor:
+            depth = 0
+            while cells:
+                self.logger.info(f"[{self.provider}] {self.keywords} 第 {depth} 层网格：{len(cells)} 个")
+                next_cells = []
+                for result in executor.map(self._crawl_cell, cells):
+                    for poi in result.pois:
+                        # 相邻网格的边界重合，同一 POI 可能被查到两次
+                        pois.setdefault(self._poi_id(poi), poi)
+                    next_cells.extend(result.children)
+                cells = next_cells
+                depth += 1
+
+        if self.provider == "gaode":
+            return RestaurantInfo.gaode_records(pois.values())
+        return RestaurantInfo.baidu_records(pois.values())
+
+    def _crawl_cell(self, cell: Cell) -> CellResult:
+        first = self._query(cell, 0)
+        total, pois = self._parse(first)
+        if total >= self.cap and cell.depth < self.max_depth:
+            return CellResult([], cell.split())
+        if total >= self.cap:
+            self.logger.warning(f"[{self.provider}] 网格 {cell} 已达最大细分层数，结果可能不完整")
+
+        n_pages = math.ceil(min(total, self.cap) / self.PAGE_SIZE)
+        for page in range(1, n_pages):
+            _, page_pois = self._parse(self._query(cell, page))
+            if not page_pois:
+                break
+            pois.extend(page_pois)
+        return CellResult(pois, [])
+
+    def _params(self, cell: Cell, page: int) -> Tuple[str, dict]:
+        if self.provider == "gaode":
+            return GAODE_POLYGON_URL, {
+                "key": self.token, "keywords": self.keywords, "types": self.poi_type,
+                "polygon": f"{cell.min_lon:.6f},{cell.max_lat:.6f}|{cell.max_lon:.6f},{cell.min_lat:.6f}",
+                "offset": self.PAGE_SIZE, "page": page + 1, "extensions": "base", "output": "JSON",
+            }
+        return BAIDU_SEARCH_URL, {
+            "ak": self.token, "query": self.keywords, "tag": self.poi_type,
+            "bounds": f"{cell.min_lat:.6f},{cell.min_lon:.6f},{cell.max_lat:.6f},{cell.max_lon:.6f}",
+            "page_size": self.PAGE_SIZE, "page_num": page, "scope": 1, "output": "json",
+        }
+
+    def _query(self, cell: Cell, page: int) -> dict:
+        url, params = self._params(cell, page)
+        cache_key = {**params, "_url": url}
+        cached = response_cache.get(self.provider, cache_key)
+        if cached is not None:
+            return cached
+        if response_cache.offline:
+            return {}
+        self.limiter.acquire_sync()
+        # 服务商返回错误（key 无效、配额用尽等）时抛出异常，不写入缓存
+        data = http_transport.check_status(self.provider, url, http_transport.get_json(self.provider, url, params=params))
+        response_cache.put(self.provider, cache_key, data)
+        return data
+
+    def _parse(self, data: dict) -> Tuple[int, List[dict]]:
+        """返回 (结果总数, 本页 POI)"""
+        if self.provider == "gaode":
+            pois = data.get("pois") or []
+            total = data.get("count")
+        else:
+            pois = data.get("results") or []
+            total = data.get("total")
+        try:
+            total = int(total)
+        except (TypeError, ValueError):
+            total = len(pois)
+        return total, list(pois)
+
+    def _poi_id(self, poi: dict) -> str:
+        poi_id = poi.get("id") if self.provider == "gaode" else poi.get("uid")
+        return poi_id or f"{poi.get('name')}|{poi.get('address')}|{poi.get('location')}"
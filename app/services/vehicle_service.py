@@ -4,7 +4,7 @@ from typing import List, Optional
 from pydantic import ValidationError
 from app.config import get_config
 from app.models.vehicle_model import Vehicle
-from app.utils import rp
+from app.utils import rp, read_excel_cached
 
 
 class VehicleService:
@@ -23,7 +23,7 @@ class VehicleService:
         if file_path:
             self.vehicles_file = rp(file_path)
         try:
-            df = pd.read_excel(self.vehicles_file)
+            df = read_excel_cached(self.vehicles_file)
             self.vehicles = []
             for idx, row in df.iterrows():
                 # 准备提取需要的字段，若缺失则给默认值
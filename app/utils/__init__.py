@@ -1,3 +1,6 @@
 from .file_io import *
 from .conversion import *
-from .logger import *
\ No newline at end of file
+from .logger import *
+from .excel_cache import *
+from .record_writer import *
+from .geocode_cache import *
\ No newline at end of file
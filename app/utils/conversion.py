@@ -1,11 +1,154 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
 from pypinyin import lazy_pinyin
+from app.utils.file_io import rp
+
+
+def _transliterate(chinese_text: str) -> str:
+    pinyin_list = lazy_pinyin(chinese_text)
+    return " ".join(pinyin_list).capitalize()  # 首字母大写处理
+
+
+class PinyinCache:
+    """
+    拼音转换缓存。
+    进程内使用有界 LRU，可选地在后面挂一个 SQLite 持久化存储，重启后仍可命中；
+    批量接口只对列中不重复且未缓存的字符串做拼音转换。
+    """
+
+    def __init__(self, max_items: int = 100000, store_path: Optional[str] = None):
+        """
+        :param max_items: 内存 LRU 最多保留的条目数
+        :param store_path: SQLite 文件路径，为 None 时不落盘
+        """
+        self.max_items = max_items
+        self.store_path = store_path
+        self._memory = OrderedDict()
+        self._conn = None
+        # fork 出的子进程从父进程继承的连接：只保留引用、不使用也不关闭，
+        # 以免被回收时在子进程中关闭父进程仍在使用的数据库句柄（见 reset_after_fork）
+        self._inherited_conn = None
+        self._lock = threading.Lock()
+
+    def set_store(self, store_path: Optional[str]):
+        """更换或关闭（传入 None）持久化存储"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self.store_path = store_path
+
+    def reset_after_fork(self):
+        """
+        在 fork 出的子进程中调用：SQLite 连接不能跨进程共享，停止使用从父进程继承的连接，之后按需重新打开。
+        """
+        self._lock = threading.Lock()
+        self._inherited_conn = self._conn
+        self._conn = None
+
+    def clear(self):
+        """清空内存缓存（持久化存储保持不变）"""
+        with self._lock:
+            self._memory.clear()
+
+    def convert(self, chinese_text: str) -> str:
+        """转换单个字符串"""
+        return self.convert_batch([chinese_text])[0]
+
+    def convert_batch(self, texts: Iterable[str]) -> List[str]:
+        """
+        批量转换拼音。
+
+        :param texts: 中文字符串列表，可以包含重复值和空值
+        :return: 与输入等长的拼音列表，空值对应空字符串
+        """
+        texts = list(texts)
+        results: Dict[str, str] = {}
+        missing = []
+        with self._lock:
+            for text in dict.fromkeys(text for text in texts if text):
+                value = self._memory.get(text)
+                if value is None:
+                    missing.append(text)
+                else:
+                    self._memory.move_to_end(text)
+                    results[text] = value
+
+        if missing:
+            found = self._store_get_many(missing)
+            computed = {text: _transliterate(text) for text in missing if text not in found}
+            self._store_put_many(computed)
+            found.update(computed)
+            results.update(found)
+            with self._lock:
+                for text, value in found.items():
+                    self._memory[text] = value
+                while len(self._memory) > self.max_items:
+                    self._memory.popitem(last=False)
+
+        return [results[text] if text else "" for text in texts]
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None and self.store_path:
+            try:
+                os.makedirs(os.path.dirname(self.store_path), exist_ok=True)
+                self._conn = sqlite3.connect(self.store_path, timeout=5, check_same_thread=False)
+                self._conn.execute("CREATE TABLE IF NOT EXISTS pinyin (text TEXT PRIMARY KEY, value TEXT NOT NULL)")
+                self._conn.commit()
+            except (OSError, sqlite3.Error):
+                # 持久化只是加速手段，不可用时退化为纯内存缓存
+                self._conn = None
+                self.store_path = None
+        return self._conn
+
+    def _store_get_many(self, texts: List[str]) -> Dict[str, str]:
+        found = {}
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return found
+            keys = [text for text in texts if isinstance(text, str)]
+            try:
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = conn.execute(f"SELECT text, value FROM pinyin WHERE text IN ({placeholders})", chunk)
+                    found.update(rows)
+            except sqlite3.Error:
+                pass
+        return found
+
+    def _store_put_many(self, values: Dict[str, str]):
+        if not values:
+            return
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return
+            try:
+                conn.executemany("INSERT OR REPLACE INTO pinyin (text, value) VALUES (?, ?)",
+                                 [(text, value) for text, value in values.items() if isinstance(text, str)])
+                conn.commit()
+            except sqlite3.Error:
+                # 多进程同时写入被锁时放弃本次落盘
+                pass
+
+
+pinyin_cache = PinyinCache(store_path=rp("pinyin.sqlite", folder=["var", "cache"]))
+
 
 def convert_to_pinyin(chinese_text: str) -> str:
-    """将中文字符串转换为拼音"""
+    """将中文字符串转换为拼音（带缓存）"""
     if not chinese_text:
         return ""
-    pinyin_list = lazy_pinyin(chinese_text)
-    return " ".join(pinyin_list).capitalize()  # 首字母大写处理
+    return pinyin_cache.convert(chinese_text)
+
+def convert_to_pinyin_batch(chinese_texts: Iterable[str]) -> List[str]:
+    """批量将中文字符串转换为拼音，只转换不重复且未缓存的字符串"""
+    return pinyin_cache.convert_batch(chinese_texts)
 
 def convert_miles_to_km(miles: float) -> float:
     """将英里转换为公里"""
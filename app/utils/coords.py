@@ -0,0 +1,208 @@
+from typing import Iterable, List, NamedTuple, Tuple
+import numpy as np
+import pandas as pd
+
+# 坐标系：高德为 GCJ-02，百度为 BD-09，Nominatim / 谷歌为 WGS84
+WGS84 = "WGS84"
+GCJ02 = "GCJ-02"
+BD09 = "BD-09"
+DATUMS = (WGS84, GCJ02, BD09)
+PROVIDER_DATUMS = {"gaode": GCJ02, "baidu": BD09, "google": WGS84, "nominatim": WGS84}
+
+# GCJ-02 偏移算法使用的克拉索夫斯基椭球参数
+_A = 6378245.0
+_EE = 0.00669342162296594323
+_X_PI = np.pi * 3000.0 / 180.0
+
+# 与 Restaurant.validate_location 相同的格式要求：'纬度,经度'
+LOCATION_PATTERN = r'^-?\d+(\.\d+)?,-?\d+(\.\d+)?$'
+
+
+class Coordinates(NamedTuple):
+    """整列坐标，纬度和经度分别为 float64 数组，无效行为 NaN"""
+    lat: np.ndarray
+    lon: np.ndarray
+
+
+class LocationError(NamedTuple):
+    """单行坐标的校验错误"""
+    row: int
+    value: object
+    reason: str
+
+
+class LocationValidationError(ValueError):
+    """坐标列校验失败，errors 中包含全部出错的行"""
+
+    def __init__(self, errors: List[LocationError], max_shown: int = 10):
+        self.errors = errors
+        details = "；".join(f"第 {e.row} 行 {e.value!r}: {e.reason}" for e in errors[:max_shown])
+        more = f"……等共 {len(errors)} 行" if len(errors) > max_shown else f"共 {len(errors)} 行"
+        super().__init__(f"location 校验失败（{more}）：{details}")
+
+
+def parse_locations(values: Iterable) -> Tuple[Coordinates, List[LocationError]]:
+    """
+    一次性解析并校验整列 '纬度,经度' 字符串。
+
+    :param values: location 列
+    :return: (坐标数组, 错误列表)；出错行的坐标为 NaN，行号为在列中的位置（从 0 开始）
+    """
+    series = pd.Series(list(values), dtype=object)
+    is_str = series.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+    well_formed = is_str.copy()
+    if is_str.any():
+        well_formed[is_str] = series[is_str].str.match(LOCATION_PATTERN).to_numpy(dtype=bool)
+
+    lat = np.full(len(series), np.nan)
+    lon = np.full(len(series), np.nan)
+    if well_formed.any():
+        parts = series[well_formed].str.split(",", n=1, expand=True)
+        lat[well_formed] = parts[0].astype(float).to_numpy()
+        lon[well_formed] = parts[1].astype(float).to_numpy()
+
+    bad_format = ~well_formed
+    bad_lat = well_formed & ~((lat >= -90) & (lat <= 90))
+    bad_lon = well_formed & ~bad_lat & ~((lon >= -180) & (lon <= 180))
+
+    errors = []
+    for rows, reason in (
+        (bad_format, "location 必须是 '纬度,经度' 格式（例如 '39.9042,116.4074'）"),
+        (bad_lat, "纬度必须在 -90 到 90 之间"),
+        (bad_lon, "经度必须在 -180 到 180 之间"),
+    ):
+        errors.extend(LocationError(int(row), series.iat[row], reason) for row in np.flatnonzero(rows))
+    errors.sort(key=lambda error: error.row)
+
+    lat[~well_formed | bad_lat | bad_lon] = np.nan
+    lon[~well_formed | bad_lat | bad_lon] = np.nan
+    return Coordinates(lat, lon), errors
+
+
+def validate_locations(values: Iterable) -> Coordinates:
+    """解析整列坐标，存在任何无效行时抛出汇总了所有错误的 LocationValidationError"""
+    coordinates, errors = parse_locations(values)
+    if errors:
+        raise LocationValidationError(errors)
+    return coordinates
+
+
+def _out_of_china(lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+    """中国境外的坐标不做 GCJ-02 偏移"""
+    return (lon < 72.004) | (lon > 137.8347) | (lat < 0.8293) | (lat > 55.8271)
+
+
+def _gcj02_delta(lon: np.ndarray, lat: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """WGS84 -> GCJ-02 的偏移量（经度, 纬度）"""
+    x = lon - 105.0
+    y = lat - 35.0
+    d_lat = (-100.0 + 2.0 * x + 3.0 * y + 0.2 * y * y + 0.1 * x * y + 0.2 * np.sqrt(np.abs(x))
+             + (20.0 * np.sin(6.0 * x * np.pi) + 20.0 * np.sin(2.0 * x * np.pi)) * 2.0 / 3.0
+             + (20.0 * np.sin(y * np.pi) + 40.0 * np.sin(y / 3.0 * np.pi)) * 2.0 / 3.0
+             + (160.0 * np.sin(y / 12.0 * np.pi) + 320 * np.sin(y * np.pi / 30.0)) * 2.0 / 3.0)
+    d_lon = (300.0 + x + 2.0 * y + 0.1 * x * x + 0.1 * x * y + 0.1 * np.sqrt(np.abs(x))
+             + (20.0 * np.sin(6.0 * x * np.pi) + 20.0 * np.sin(2.0 * x * np.pi)) * 2.0 / 3.0
+             + (20.0 * np.sin(x * np.pi) + 40.0 * np.sin(x / 3.0 * np.pi)) * 2.0 / 3.0
+             + (150.0 * np.sin(x / 12.0 * np.pi) + 300.0 * np.sin(x / 30.0 * np.pi)) * 2.0 / 3.0)
+    rad_lat = lat / 180.0 * np.pi
+    magic = 1 - _EE * np.sin(rad_lat) ** 2
+    sqrt_magic = np.sqrt(magic)
+    d_lat = (d_lat * 180.0) / ((_A * (1 - _EE)) / (magic * sqrt_magic) * np.pi)
+    d_lon = (d_lon * 180.0) / (_A / sqrt_magic * np.cos(rad_lat) * np.pi)
+    outside = _out_of_china(lon, lat)
+    return np.where(outside, 0.0, d_lon), np.where(outside, 0.0, d_lat)
+
+
+def wgs84_to_gcj02(lon, lat) -> Tuple[np.ndarray, np.ndarray]:
+    """WGS84 -> GCJ-02，参数和返回值均为整列数组（经度, 纬度）"""
+    lon, lat = np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+    d_lon, d_lat = _gcj02_delta(lon, lat)
+    return lon + d_lon, lat + d_lat
+
+
+def gcj02_to_wgs84(lon, lat, iterations: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+    """GCJ-02 -> WGS84，迭代求逆，3 次迭代误差在 1e-7 度以内"""
+    lon, lat = np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+    wgs_lon, wgs_lat = lon.copy(), lat.copy()
+    for _ in range(iterations):
+        gcj_lon, gcj_lat = wgs84_to_gcj02(wgs_lon, wgs_lat)
+        wgs_lon -= gcj_lon - lon
+        wgs_lat -= gcj_lat - lat
+    return wgs_lon, wgs_lat
+
+
+def gcj02_to_bd09(lon, lat) -> Tuple[np.ndarray, np.ndarray]:
+    """GCJ-02 -> BD-09"""
+    lon, lat = np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+    z = np.sqrt(lon * lon + lat * lat) + 0.00002 * np.sin(lat * _X_PI)
+    theta = np.arctan2(lat, lon) + 0.000003 * np.cos(lon * _X_PI)
+    return z * np.cos(theta) + 0.0065, z * np.sin(theta) + 0.006
+
+
+def bd09_to_gcj02(lon, lat) -> Tuple[np.ndarray, np.ndarray]:
+    """BD-09 -> GCJ-02"""
+    lon, lat = np.asarray(lon, dtype=float) - 0.0065, np.asarray(lat, dtype=float) - 0.006
+    z = np.sqrt(lon * lon + lat * lat) - 0.00002 * np.sin(lat * _X_PI)
+    theta = np.arctan2(lat, lon) - 0.000003 * np.cos(lon * _X_PI)
+    return z * np.cos(theta), z * np.sin(theta)
+
+
+def convert_coordinates(lon, lat, src: str, dst: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    在 WGS84 / GCJ-02 / BD-09 之间转换整列坐标（以 GCJ-02 为中转）。
+
+    :param lon: 经度数组
+    :param lat: 纬度数组
+    :param src: 源坐标系，取值见 DATUMS
+    :param dst: 目标坐标系
+    :return: (经度, 纬度)，NaN 保持为 NaN
+    """
+    for datum in (src, dst):
+        if datum not in DATUMS:
+            raise ValueError(f"不支持的坐标系：{datum}")
+    lon, lat = np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+    if src == dst:
+        return lon.copy(), lat.copy()
+    if src == WGS84:
+        lon, lat = wgs84_to_gcj02(lon, lat)
+    elif src == BD09:
+        lon, lat = bd09_to_gcj02(lon, lat)
+    if dst == WGS84:
+        return gcj02_to_wgs84(lon, lat)
+    if dst == BD09:
+        return gcj02_to_bd09(lon, lat)
+    return lon, lat
+
+
+def convert_records(records: List[dict], target: str = GCJ02) -> List[dict]:
+    """
+    把抓取记录的 location（'经度,纬度'）统一转换到 target 坐标系。
+    每条记录的源坐标系取自 datum 字段；没有 datum 或 location 无法解析的记录保持原样。
+
+    :param records: 抓取记录
+    :param target: 目标坐标系
+    :return: 新的记录列表（转换过的记录为副本，datum 更新为 target）
+    """
+    records = list(records)
+    frame = pd.DataFrame({
+        "location": pd.Series([record.get("location") for record in records], dtype=object),
+        "datum": pd.Series([record.get("datum") for record in records], dtype=object),
+    })
+    is_str = frame["location"].map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+    parts = frame["location"].where(is_str).str.split(",", n=1, expand=True)
+    if parts.shape[1] < 2:
+        return records
+    lon = pd.to_numeric(parts[0], errors="coerce").to_numpy(dtype=float)
+    lat = pd.to_numeric(parts[1], errors="coerce").to_numpy(dtype=float)
+    valid = ~(np.isnan(lon) | np.isnan(lat))
+
+    for datum in DATUMS:
+        if datum == target:
+            continue
+        rows = np.flatnonzero(valid & (frame["datum"] == datum).to_numpy(dtype=bool))
+        if len(rows) == 0:
+            continue
+        new_lon, new_lat = convert_coordinates(lon[rows], lat[rows], datum, target)
+        for row, x, y in zip(rows, new_lon, new_lat):
+            records[row] = {**records[row], "location": f"{x:.6f},{y:.6f}", "datum": target}
+    return records
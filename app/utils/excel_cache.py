@@ -0,0 +1,144 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+import pandas as pd
+from app.utils.file_io import rp
+
+
+class ExcelCache:
+    """
+    Excel 解析结果缓存。
+
+    - 以 文件内容哈希 + 读取参数 作为缓存键，内容不变的工作簿只解析一次；
+    - 路径 + 修改时间 + 文件大小 用于记住已计算过的内容哈希，避免重复读取整个文件；
+    - 进程内保留一份 LRU 内存缓存，磁盘上以 pickle 二进制格式保存，重启后仍可命中；
+    - 内存按条目数、磁盘按总字节数进行淘汰。
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_memory_items: int = 8,
+                 max_disk_bytes: int = 512 * 1024 * 1024):
+        """
+        :param cache_dir: 磁盘缓存目录，默认为 app/var/cache/excel
+        :param max_memory_items: 内存中最多保留的 DataFrame 数量
+        :param max_disk_bytes: 磁盘缓存的最大总字节数
+        """
+        self.cache_dir = cache_dir or rp("excel", folder=["var", "cache"])
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()  # 缓存键 -> DataFrame
+        self._digests = {}  # (路径, 修改时间, 大小) -> 内容哈希
+        self._lock = threading.Lock()
+
+    def read_excel(self, file_path: str, **kwargs) -> pd.DataFrame:
+        """
+        读取 Excel 文件，命中缓存时直接返回缓存的 DataFrame（副本）。
+
+        :param file_path: Excel 文件路径
+        :param kwargs: 透传给 pd.read_excel 的参数，也参与缓存键的计算
+        :return: DataFrame
+        """
+        key = self._make_key(self._file_digest(file_path), kwargs)
+
+        with self._lock:
+            df = self._memory.get(key)
+            if df is not None:
+                self._memory.move_to_end(key)
+                return df.copy()
+
+        df = self._load_from_disk(key)
+        if df is None:
+            df = pd.read_excel(file_path, **kwargs)
+            self._save_to_disk(key, df)
+
+        with self._lock:
+            self._memory[key] = df
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+        return df.copy()
+
+    def clear(self):
+        """清空内存和磁盘缓存"""
+        with self._lock:
+            self._memory.clear()
+            self._digests.clear()
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".pkl"):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    def _file_digest(self, file_path: str) -> str:
+        """计算文件内容哈希，路径、修改时间和大小不变时直接复用"""
+        stat = os.stat(file_path)
+        path_key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+        digest = self._digests.get(path_key)
+        if digest is None:
+            hasher = hashlib.sha1()
+            with open(file_path, "rb") as file:
+                for block in iter(lambda: file.read(1024 * 1024), b""):
+                    hasher.update(block)
+            digest = hasher.hexdigest()
+            self._digests[path_key] = digest
+        return digest
+
+    @staticmethod
+    def _make_key(digest: str, kwargs: dict) -> str:
+        if not kwargs:
+            return digest
+        params = repr(sorted(kwargs.items()))
+        return f"{digest}-{hashlib.sha1(params.encode('utf-8')).hexdigest()[:12]}"
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def _load_from_disk(self, key: str) -> Optional[pd.DataFrame]:
+        path = self._cache_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            df = pd.read_pickle(path)
+            os.utime(path)  # 刷新访问时间，供淘汰时使用
+            return df
+        except Exception:
+            # 缓存文件损坏时直接丢弃，重新解析
+            os.remove(path)
+            return None
+
+    def _save_to_disk(self, key: str, df: pd.DataFrame):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._cache_path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            df.to_pickle(tmp_path)
+            os.replace(tmp_path, path)
+            self._evict_disk()
+        except OSError:
+            # 磁盘缓存只是加速手段，写入失败不影响读取结果
+            pass
+
+    def _evict_disk(self):
+        """按最近使用时间淘汰磁盘缓存，直到总大小不超过上限"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pkl"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+
+
+excel_cache = ExcelCache()
+
+
+def read_excel_cached(file_path: str, **kwargs) -> pd.DataFrame:
+    """通过全局 Excel 缓存读取文件，参数同 pd.read_excel"""
+    return excel_cache.read_excel(file_path, **kwargs)
+
+
+__all__ = ["ExcelCache", "excel_cache", "read_excel_cached"]
@@ -0,0 +1,164 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+from app.utils.file_io import rp
+
+__all__ = ["GeocodeCache", "geocode_cache", "address_key", "coordinate_key", "location_key"]
+
+_COORDINATE = re.compile(r"^\s*@?(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+def address_key(service: str, address: str) -> str:
+    """按归一化的地址生成缓存键：全角转半角、转小写、合并空白"""
+    text = unicodedata.normalize("NFKC", str(address)).strip().lower()
+    return f"{service}:a:{' '.join(text.split())}"
+
+
+def coordinate_key(service: str, first: float, second: float, precision: int = 5) -> str:
+    """按四舍五入后的坐标生成缓存键，默认保留 5 位小数（约 1 米）"""
+    return f"{service}:c:{round(float(first), precision):.{precision}f},{round(float(second), precision):.{precision}f}"
+
+
+def location_key(service: str, location: str, precision: int = 5) -> str:
+    """location 为 '数值,数值' 时按坐标生成键，否则按地址生成键"""
+    match = _COORDINATE.match(str(location))
+    if match:
+        return coordinate_key(service, float(match.group(1)), float(match.group(2)), precision)
+    return address_key(service, location)
+
+
+class GeocodeCache:
+    """
+    地理编码 / 逆地理编码结果缓存。
+    进程内为有界 LRU，后面挂一个 SQLite 持久化存储；查询无结果（None）也会被缓存（负缓存），
+    负缓存的有效期较短，之后会重新查询。查询抛出异常时不缓存。
+    """
+
+    # 缓存中表示“查询无结果”的值
+    _NEGATIVE = None
+
+    def __init__(self, max_items: int = 50000, store_path: Optional[str] = None,
+                 ttl: float = 30 * 24 * 3600, negative_ttl: float = 24 * 3600):
+        """
+        :param max_items: 内存 LRU 最多保留的条目数
+        :param store_path: SQLite 文件路径，为 None 时不落盘
+        :param ttl: 有结果条目的有效期（秒），<= 0 表示永不过期
+        :param negative_ttl: 无结果条目的有效期（秒）
+        """
+        self.max_items = max_items
+        self.store_path = store_path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def stats(self) -> dict:
+        """命中统计，hits 含负缓存命中"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "negative_hits": self.negative_hits, "misses": self.misses,
+                    "hit_rate": self.hits / total if total else 0.0, "memory_items": len(self._memory)}
+
+    def clear(self):
+        """清空内存缓存（持久化存储保持不变）"""
+        with self._lock:
+            self._memory.clear()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        :return: (是否命中, 缓存的值)；命中负缓存时值为 None
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._expired(entry):
+                self._memory.move_to_end(key)
+                return self._hit(entry[0])
+            entry = self._store_get(key)
+            if entry is not None and not self._expired(entry):
+                self._remember(key, entry)
+                return self._hit(entry[0])
+            self.misses += 1
+            return False, None
+
+    def put(self, key: str, value: Any):
+        """写入结果，value 为 None 表示查询无结果；value 需可 JSON 序列化"""
+        entry = (value, time.time())
+        with self._lock:
+            self._remember(key, entry)
+            self._store_put(key, entry)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """命中时直接返回缓存的值，否则调用 compute 查询并缓存其结果（包括 None）"""
+        found, value = self.get(key)
+        if found:
+            return value
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def _hit(self, value) -> Tuple[bool, Any]:
+        self.hits += 1
+        if value is self._NEGATIVE:
+            self.negative_hits += 1
+        return True, value
+
+    def _expired(self, entry: Tuple[Any, float]) -> bool:
+        ttl = self.negative_ttl if entry[0] is self._NEGATIVE else self.ttl
+        return ttl > 0 and time.time() - entry[1] > ttl
+
+    def _remember(self, key: str, entry: Tuple[Any, float]):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None and self.store_path:
+            try:
+                os.makedirs(os.path.dirname(self.store_path), exist_ok=True)
+                self._conn = sqlite3.connect(self.store_path, timeout=5, check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS geocode (key TEXT PRIMARY KEY, value TEXT, created REAL NOT NULL)")
+                self._conn.commit()
+            except (OSError, sqlite3.Error):
+                # 持久化只是加速手段，不可用时退化为纯内存缓存
+                self._conn = None
+                self.store_path = None
+        return self._conn
+
+    def _store_get(self, key: str) -> Optional[Tuple[Any, float]]:
+        conn = self._connection()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute("SELECT value, created FROM geocode WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        return (None if row[0] is None else json.loads(row[0])), row[1]
+
+    def _store_put(self, key: str, entry: Tuple[Any, float]):
+        conn = self._connection()
+        if conn is None:
+            return
+        value, created = entry
+        try:
+            conn.execute("INSERT OR REPLACE INTO geocode (key, value, created) VALUES (?, ?, ?)",
+                         (key, None if value is None else json.dumps(value, ensure_ascii=False), created))
+            conn.commit()
+        except sqlite3.Error:
+            pass
+
+
+geocode_cache = GeocodeCache(store_path=rp("geocode.sqlite", folder=["var", "cache"]))
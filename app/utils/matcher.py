@@ -0,0 +1,79 @@
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick 多模式字符串匹配自动机。
+    构建一次后，对任意文本只需单次扫描即可找出所有模式的出现位置，
+    耗时与文本长度和命中数量相关，与模式数量无关。
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        """
+        :param patterns: 模式串列表，模式编号即其在列表中的下标
+        """
+        self.patterns: List[str] = []
+        self._empty_ids: List[int] = []  # 空模式在任何文本中都视为命中
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+        for pattern in patterns:
+            self._add(pattern)
+        self._build()
+
+    def _add(self, pattern: str):
+        pattern_id = len(self.patterns)
+        self.patterns.append(pattern)
+        if not pattern:
+            self._empty_ids.append(pattern_id)
+            return
+
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(pattern_id)
+
+    def _build(self):
+        """按广度优先计算失败指针，并把失败链上的输出合并到当前状态"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """
+        扫描文本并逐个返回命中结果。
+
+        :param text: 待匹配文本
+        :return: (命中结束位置, 模式编号) 的迭代器，空模式的结束位置记为 -1
+        """
+        for pattern_id in self._empty_ids:
+            yield -1, pattern_id
+
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for pattern_id in output[state]:
+                yield index, pattern_id
+
+    def find_ids(self, text: str) -> Set[int]:
+        """返回文本中出现过的全部模式编号"""
+        return {pattern_id for _, pattern_id in self.iter_matches(text)}
@@ -0,0 +1,46 @@
+import asyncio
+import threading
+import time
+
+__all__ = ["TokenBucket"]
+
+
+class TokenBucket:
+    """
+    令牌桶限流器：平均每秒 rate 个令牌，最多积攒 capacity 个（允许的突发量）。
+    采用预约方式发放令牌，与事件循环和线程无关，同一个实例可以被多个事件循环或线程共享。
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        """
+        :param rate: 每秒发放的令牌数，<= 0 表示不限流
+        :param capacity: 桶容量
+        """
+        self.rate = float(rate)
+        self.capacity = max(float(capacity), 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """预约一个令牌，返回需要等待的秒数（令牌已扣除，余额可以为负）"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    async def acquire(self):
+        """异步等待直到拿到一个令牌"""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self):
+        """阻塞等待直到拿到一个令牌"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
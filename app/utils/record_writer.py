@@ -0,0 +1,145 @@
+import csv
+import os
+from typing import Dict, Iterable, List, Optional
+
+__all__ = ["RecordWriter", "XlsxRecordWriter", "CsvRecordWriter", "ParquetRecordWriter", "open_record_writer"]
+
+
+class RecordWriter:
+    """
+    流式写出记录（dict）的基类：按 columns 指定的键取值，逐行写出，不在内存中缓存全部数据。
+    作为上下文管理器使用，退出时写完并关闭文件。
+    """
+
+    def __init__(self, path: str, columns: Dict[str, str]):
+        """
+        :param path: 输出文件路径
+        :param columns: 记录的键 -> 表头，按此顺序输出
+        """
+        self.path = path
+        self.columns = columns
+        self.rows_written = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def _row(self, record: dict) -> list:
+        return [record.get(key) for key in self.columns]
+
+    def write(self, record: dict):
+        self.write_many([record])
+
+    def write_many(self, records: Iterable[dict]):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class XlsxRecordWriter(RecordWriter):
+    """openpyxl 只写模式的 xlsx，内存占用与行数无关，没有 xls 的 65536 行限制"""
+
+    def __init__(self, path: str, columns: Dict[str, str], sheet_name: str = "Sheet1"):
+        super().__init__(path, columns)
+        from openpyxl import Workbook
+        self._book = Workbook(write_only=True)
+        self._sheet = self._book.create_sheet(sheet_name)
+        self._sheet.append(list(columns.values()))
+
+    def write_many(self, records: Iterable[dict]):
+        for record in records:
+            self._sheet.append([self._cell(value) for value in self._row(record)])
+            self.rows_written += 1
+
+    @staticmethod
+    def _cell(value):
+        # 列表、字典等复合值转为字符串写入
+        if value is None or isinstance(value, (str, int, float, bool)):
+            return value
+        return str(value)
+
+    def close(self):
+        if self._book is not None:
+            self._book.save(self.path)
+            self._book = None
+
+
+class CsvRecordWriter(RecordWriter):
+    """UTF-8（带 BOM，Excel 可直接打开）CSV"""
+
+    def __init__(self, path: str, columns: Dict[str, str]):
+        super().__init__(path, columns)
+        self._file = open(path, "w", newline="", encoding="utf-8-sig")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(list(columns.values()))
+
+    def write_many(self, records: Iterable[dict]):
+        for record in records:
+            self._writer.writerow(["" if value is None else value for value in self._row(record)])
+            self.rows_written += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ParquetRecordWriter(RecordWriter):
+    """Parquet，按 batch_size 行一个 row group 写出；所有列按字符串存储（需要安装 pyarrow）"""
+
+    def __init__(self, path: str, columns: Dict[str, str], batch_size: int = 10000):
+        super().__init__(path, columns)
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("写出 Parquet 需要安装 pyarrow") from e
+        self._pa = pa
+        self._schema = pa.schema([(header, pa.string()) for header in columns.values()])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._batch: List[list] = []
+        self.batch_size = batch_size
+
+    def write_many(self, records: Iterable[dict]):
+        for record in records:
+            self._batch.append([None if value is None else str(value) for value in self._row(record)])
+            self.rows_written += 1
+            if len(self._batch) >= self.batch_size:
+                self._flush()
+
+    def _flush(self):
+        if not self._batch:
+            return
+        arrays = [self._pa.array([row[i] for row in self._batch], type=self._pa.string())
+                  for i in range(len(self.columns))]
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+        self._batch = []
+
+    def close(self):
+        if self._writer is not None:
+            self._flush()
+            self._writer.close()
+            self._writer = None
+
+
+def open_record_writer(path: str, columns: Dict[str, str], sheet_name: Optional[str] = None) -> RecordWriter:
+    """
+    按文件扩展名选择写出格式：.xlsx / .csv / .parquet。
+
+    :param path: 输出文件路径
+    :param columns: 记录的键 -> 表头
+    :param sheet_name: xlsx 的工作表名
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return CsvRecordWriter(path, columns)
+    if ext == ".parquet":
+        return ParquetRecordWriter(path, columns)
+    if ext == ".xlsx":
+        return XlsxRecordWriter(path, columns, sheet_name or "Sheet1")
+    raise ValueError(f"不支持的输出格式：{ext}（支持 .xlsx / .csv / .parquet）")
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Union
+from urllib.parse import parse_qsl, urlsplit
+
+__all__ = ["ResponseCache", "normalize_request"]
+
+# 不参与缓存键计算的凭据参数
+CREDENTIAL_PARAMS = {"key", "ak", "api_key", "sk"}
+
+
+def normalize_request(provider: str, request: Union[str, dict]) -> str:
+    """
+    将一次分页请求规范化为稳定的字符串：服务商、接口路径和排序后的查询参数
+    （关键字、类型、区域/坐标、半径、页码等），去掉 key/ak 等凭据，换 key 后仍能命中。
+
+    :param provider: 服务商名称
+    :param request: 请求 URL，或查询参数字典（SerpAPI）
+    """
+    if isinstance(request, str):
+        parts = urlsplit(request)
+        params = dict(parse_qsl(parts.query))
+        params["_path"] = parts.path
+    else:
+        params = dict(request)
+    params = {
+        name: str(value).strip() for name, value in params.items()
+        if name.lower() not in CREDENTIAL_PARAMS and value is not None
+    }
+    params["_provider"] = provider
+    return json.dumps(params, ensure_ascii=False, sort_keys=True)
+
+
+class ResponseCache:
+    """
+    地图查询结果的磁盘缓存（SQLite），按规范化的请求参数缓存每一页的结果。
+    条目超过 ttl 秒视为过期；总大小超过 max_bytes 时按最近访问时间淘汰；
+    离线模式下只读缓存（过期条目同样返回），不发起网络请求。
+    """
+
+    def __init__(self, path: Optional[str], ttl: float = 7 * 24 * 3600, max_bytes: int = 256 * 1024 * 1024,
+                 offline: bool = False):
+        """
+        :param path: SQLite 文件路径，为 None 时不缓存
+        :param ttl: 有效期（秒），<= 0 表示永不过期
+        :param max_bytes: 缓存内容的总大小上限
+        :param offline: 是否只使用缓存
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, request: Union[str, dict]) -> Optional[dict]:
+        """
+        读取缓存的结果。
+
+        :return: 缓存的内容，未命中或已过期时返回 None
+        """
+        key = self._key(provider, request)
+        with self._lock:
+            conn = self._connection()
+            row = None
+            if conn is not None:
+                try:
+                    row = conn.execute("SELECT payload, created FROM responses WHERE key = ?", (key,)).fetchone()
+                    if row is not None and not self.offline and self.ttl > 0 and time.time() - row[1] > self.ttl:
+                        row = None
+                    if row is not None:
+                        conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+                        conn.commit()
+                except sqlite3.Error:
+                    row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, provider: str, request: Union[str, dict], payload: dict):
+        """写入一页的结果，payload 需可 JSON 序列化"""
+        params = normalize_request(provider, request)
+        key = hashlib.sha1(params.encode("utf-8")).hexdigest()
+        data = json.dumps(payload, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return
+            try:
+                old = conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, provider, params, payload, created, accessed, size) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, provider, params, data, now, now, len(data)))
+                conn.commit()
+                self._total_bytes += len(data) - (old[0] if old else 0)
+                if self._total_bytes > self.max_bytes:
+                    self._evict(conn)
+            except sqlite3.Error:
+                # 缓存只是加速手段，写入失败时忽略
+                pass
+
+    def clear(self):
+        """清空所有缓存条目"""
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return
+            try:
+                conn.execute("DELETE FROM responses")
+                conn.commit()
+                self._total_bytes = 0
+            except sqlite3.Error:
+                pass
+
+    def stats(self) -> dict:
+        """命中统计"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "bytes": self._total_bytes}
+
+    def _key(self, provider: str, request: Union[str, dict]) -> str:
+        return hashlib.sha1(normalize_request(provider, request).encode("utf-8")).hexdigest()
+
+    def _evict(self, conn: sqlite3.Connection):
+        """按最近访问时间从旧到新删除，直到总大小降到上限的 90%"""
+        target = self.max_bytes * 0.9
+        rows = conn.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall()
+        victims = []
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            victims.append((key,))
+            self._total_bytes -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        conn.commit()
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None and self.path:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, provider TEXT, params TEXT, "
+                    "payload TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL, size INTEGER NOT NULL)")
+                self._conn.commit()
+                self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            except (OSError, sqlite3.Error):
+                self._conn = None
+                self.path = None
+        return self._conn
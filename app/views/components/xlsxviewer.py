@@ -10,6 +10,7 @@ from PyQt5.QtGui import QStandardItemModel, QStandardItem, QFont, QBrush
 import os
 import platform
 import subprocess
+from app.utils import read_excel_cached
 
 class XlsxViewer(QWidget):
     def __init__(self, parent=None):
@@ -86,8 +87,8 @@ class XlsxViewer(QWidget):
             QMessageBox.warning(self, "警告", "请先加载文件后再刷新")
             return
         try:
-            if df is None:
-                data = pd.read_excel(self.file_path)
+            if not isinstance(df, pd.DataFrame):  # 按钮点击时传入的是 checked 标志
+                df = read_excel_cached(self.file_path)
             self.load_data(df)
             QMessageBox.information(self, "成功", "数据已刷新")
         except Exception as e:
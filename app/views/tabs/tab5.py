@@ -3,7 +3,7 @@ from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPu
 from PyQt5.QtCore import Qt,QCoreApplication
 import pandas as pd
 from PyQt5.QtGui import QStandardItemModel, QStandardItem,QIntValidator  
-from app.controllers import flow5_get_restaurantinfo,flow5_location_change,flow5_write_to_excel
+from app.controllers import flow5_get_restaurantinfo,flow5_location_change,flow5_write_to_excel,flow5_crawl_restaurants,flow5_crawl_restaurants_tiled,flow5_remove_duplicates
 from app.config import get_config
 from app.utils import rp, setup_logger
 import xlrd
@@ -94,7 +94,7 @@ class Tab5(QWidget):
         keywords = []
         lists = keyword_lists.split('/')
         keywords.extend(lists)
-        keywords_list = list(set(keywords))
+        keywords_list = list(dict.fromkeys(keywords))  # 去重并保持配置中的顺序
         return keywords_list
     ## 生成excel提示框
     def show_centered_message(self, title, text):
@@ -112,16 +112,8 @@ class Tab5(QWidget):
         return msg_box
     
     def remove_duplicates(self, input_list):
-        seen = set()
-        new_list = []
-        for item in input_list:
-            # 将列表转换为元组，因为元组是可哈希的
-            item_tuple = tuple(item)
-            if item_tuple not in seen:
-                seen.add(item_tuple)
-                # 如果需要保持原样为列表，则在添加回结果时再转回列表
-                new_list.append(list(item_tuple))
-        return new_list
+        # 按坐标邻近 + 名称/电话/地址相似度去重，同一餐厅的多条记录合并为一条
+        return flow5_remove_duplicates(input_list)
     ## 生成excel
     def on_generate_excel(self):
         if not self.city_input_value:
@@ -137,8 +129,10 @@ class Tab5(QWidget):
             # try:
             try:
                 self.city_lat_lon  = flow5_location_change(self.city_input_value)
+                city_datum = "WGS84"  # Nominatim 返回 WGS84 坐标，抓取时转换为各地图的坐标系
             except:
                 self.city_lat_lon = self.city_input_value
+                city_datum = None
 
             self.restaurantList=[]
             # 动态生成保存路径
@@ -146,39 +140,54 @@ class Tab5(QWidget):
             self.default_save_path = os.path.join(os.getcwd(), f"{sanitized_city}__restaurant_data.xlsx")
             #获取关键字
             keywords_list= self.get_keywords()
+            api_number_map = {
+                "高德地图": 1,
+                "百度地图": 2,
+                "serp_谷歌地图": 3,
+                "TripAdvior爬取": 4
+            }
+            tokens = {}
             for api_type in ["百度地图"
                             ,"高德地图" 
                             #  ,"serp_谷歌地图"
                             ]:
                 self.api_type = api_type
                 # 获取 api_key
-                self.api_key = self.get_selected_api_key()
-                api_number_map = {
-                    "高德地图": 1,
-                    "百度地图": 2,
-                    "serp_谷歌地图": 3,
-                    "TripAdvior爬取": 4
-                }
-                # 获取api对应的number
-                api_number = api_number_map.get(self.api_type, 0)
-
-                #循环关键字
-                for key_words in keywords_list:
-                    
-                    self.keywords_input_value = key_words
-                    print(self.keywords_input_value, api_type,self.default_save_path,sep='\n')
-                    restaurantList_api = flow5_get_restaurantinfo(self.page_number,self.api_key, self.keywords_input_value,self.city_lat_lon , api_number,self.default_save_path)
-                    self.restaurantList.extend(restaurantList_api)
+                tokens[api_number_map.get(self.api_type, 0)] = self.get_selected_api_key()
+
+            # 关键字 × 服务商的抓取任务，每页完成即保存；失败后再次生成会从断点继续
+            # 开启网格模式时按城市范围切分网格抓取，不受翻页上限限制
+            crawl_job = None
+            tiled = self.conf.get("SYSTEM.map_tiling.enabled", False)
+            try:
+                if tiled:
+                    self.restaurantList = flow5_crawl_restaurants_tiled(self.city_input_value, tokens, keywords_list)
+                else:
+                    crawl_job, self.restaurantList = flow5_crawl_restaurants(self.page_number, tokens, keywords_list, self.city_lat_lon, city_datum)
+            except Exception as e:
+                progress_msg.close()
+                # 只有关键字翻页抓取有断点，网格抓取失败后需要重新抓取
+                resume_hint = "" if tiled else "\n已完成的部分已保存，重新生成将从中断处继续"
+                error_msg = self.show_centered_message("错误", f"餐厅抓取中断: {str(e)}{resume_hint}")
+                error_msg.exec_()
+                return
 
             print(self.restaurantList)            
             self.restaurantList = self.remove_duplicates(self.restaurantList)
             print(self.restaurantList)
             flow5_write_to_excel(self.restaurantList,self.default_save_path)
+            # 有服务商返回错误（key 无效、配额用尽等）时保留断点，修正后重新生成只补抓出错的部分
+            status_hint = ""
+            if crawl_job is not None and crawl_job.status_errors:
+                failed = "、".join(dict.fromkeys(f"{provider} {keyword}" for provider, keyword, _ in crawl_job.status_errors))
+                status_hint = f"\n以下抓取因服务商返回错误未完成（详见日志）：{failed}\n修正后重新生成将补抓这部分"
+            elif crawl_job is not None:
+                crawl_job.discard()
             # 关闭正在生成的消息框
             progress_msg.close()
 
                 # 显示成功消息
-            success_msg = self.show_centered_message("成功", f"Excel文件已保存至: {self.default_save_path}")
+            success_msg = self.show_centered_message("成功", f"Excel文件已保存至: {self.default_save_path}{status_hint}")
             success_msg.exec_()
 
             # except Exception as e:
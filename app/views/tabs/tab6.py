@@ -5,6 +5,7 @@ import pandas as pd
 from datetime import datetime
 import os
 from app.controllers.flow6 import flow6_deal_relation_data
+from app.utils import read_excel_cached
 
 class Tab6(QWidget):
     def __init__(self, parent=None):
@@ -95,7 +96,7 @@ class Tab6(QWidget):
         )
         if file_path:
             try:
-                df = pd.read_excel(file_path)
+                df = read_excel_cached(file_path)
                 if button_text == "餐厅Excel":
                     self.restaurant_df = df
                 elif button_text == "平衡表总表Excel":